@@ -0,0 +1,208 @@
+"""
+Benchmark and golden-output regression check for the time extractors.
+
+Runs every available extractor row by row over the bundled Supabase export and over synthetic
+copies scaled 10x and 100x, and reports rows/s, p50/p99 per-row latency and peak Python memory.
+At scale 1 the output is compared with golden_schedules.json; any difference makes the script
+exit with status 1, so performance work can't silently change the extracted hours.
+
+    python benchmark_extractors.py                       # all extractors, scales 1 10 100
+    python benchmark_extractors.py --scales 1 --extractors rules
+    python benchmark_extractors.py --update-golden       # after an intended output change
+    python benchmark_extractors.py --extractors java --scales 1 --no-memory --profile java.prom
+
+Extractors whose dependencies are missing (pandas, the JVM bridge) are reported and skipped.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from profiling import add_profile_arguments, profiler
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(project_dir, "Supabase_Snippet_Event_Management_Table.csv")
+DEFAULT_GOLDEN = os.path.join(project_dir, "golden_schedules.json")
+
+
+def load_rules_extractor():
+    from output_time_json import extract_schedule
+    # The golden file stores the schedule as written to the NDJSON output
+    return extract_schedule, lambda schedule: schedule.to_dict()
+
+
+def load_hours_days_extractor():
+    from extract_hours_days import days_of_week, extract_hours
+    # Only days with times are kept, so the golden file stays small
+    return extract_hours, lambda times: {day: list(day_times) for day, day_times in zip(days_of_week, times) if day_times}
+
+
+def load_java_extractor():
+    sys.path.insert(0, os.path.join(project_dir, "modules"))
+    from extractor import ExtractionService, init
+    # Started here so the JVM start-up isn't counted in the first extraction's latency
+    init()
+    return ExtractionService.extract, lambda result: result
+
+
+# name -> loader returning (extract function taking one description, normalizer to the golden shape)
+EXTRACTORS = {
+    "rules": load_rules_extractor,
+    "hours_days": load_hours_days_extractor,
+    "java": load_java_extractor,
+}
+
+
+def read_rows(csv_file):
+    csv.field_size_limit(2 ** 31 - 1)
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        return [(row["id"], row["description"]) for row in csv.DictReader(f)]
+
+
+def scale_rows(rows, factor):
+    """
+    Builds a synthetic export factor times larger by repeating every row under new ids.
+
+    Args:
+        rows (list): (id, description) pairs.
+        factor (int): Number of copies.
+
+    Returns:
+        list: The scaled rows, copies interleaved so each block has the original mix of texts.
+    """
+    if factor == 1:
+        return rows
+    return [(f"{event_id}-{copy}", description) for copy in range(factor) for event_id, description in rows]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_timed(extract_fn, rows):
+    """
+    Extracts every row, timing each call.
+
+    Returns:
+        tuple: (results by id, per-row latencies in seconds, total seconds).
+    """
+    results = {}
+    latencies = []
+    clock = time.perf_counter
+    started = clock()
+    for event_id, description in rows:
+        row_started = clock()
+        results[event_id] = extract_fn(description)
+        latencies.append(clock() - row_started)
+    return results, latencies, clock() - started
+
+
+def peak_memory(extract_fn, rows):
+    # Separate pass: tracemalloc slows allocation-heavy code down too much to time it at the same time
+    tracemalloc.start()
+    try:
+        results = [extract_fn(description) for _, description in rows]
+        return tracemalloc.get_traced_memory()[1], len(results)
+    finally:
+        tracemalloc.stop()
+
+
+def compare_with_golden(name, results, normalize, golden):
+    """
+    Compares the results at scale 1 with the golden file.
+
+    Returns:
+        list: Ids whose output differs (missing from one side or with a different value).
+    """
+    expected = golden.get(name)
+    if expected is None:
+        return None
+    actual = {event_id: normalize(result) for event_id, result in results.items()}
+    actual = {event_id: result for event_id, result in actual.items() if result}
+    ids = sorted(set(expected) | set(actual), key=lambda event_id: (len(event_id), event_id))
+    return [event_id for event_id in ids if expected.get(event_id) != actual.get(event_id)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the time extractors and check their output against a golden file.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV)
+    parser.add_argument("--extractors", nargs="+", choices=list(EXTRACTORS), default=list(EXTRACTORS))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite the golden output of the selected extractors.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory pass.")
+    parser.add_argument("--json", help="Also write the measurements to this JSON file.")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.profile:
+        # Covers every pass, the memory pass included: the stage totals, not the rows/s, are the point
+        profiler.enable(args.profile_slowest)
+
+    rows = read_rows(args.input)
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden, encoding="utf-8") as f:
+            golden = json.load(f)
+
+    report = []
+    failures = 0
+    print(f"{'extractor':<12} {'scale':>5} {'rows':>8} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak MiB':>9}")
+    for name in args.extractors:
+        try:
+            extract_fn, normalize = EXTRACTORS[name]()
+        except Exception as e:
+            print(f"{name:<12} skipped: {e!r}")
+            continue
+        for factor in args.scales:
+            scaled = scale_rows(rows, factor)
+            results, latencies, seconds = run_timed(extract_fn, scaled)
+            latencies.sort()
+            peak = None if args.no_memory else peak_memory(extract_fn, scaled)[0]
+            measurement = {
+                "extractor": name,
+                "scale": factor,
+                "rows": len(scaled),
+                "rows_per_second": len(scaled) / seconds if seconds else float("inf"),
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "peak_mib": None if peak is None else peak / 2 ** 20,
+            }
+            report.append(measurement)
+            peak_text = "-" if peak is None else f"{measurement['peak_mib']:.1f}"
+            print(f"{name:<12} {factor:>5} {len(scaled):>8} {measurement['rows_per_second']:>10.0f} "
+                  f"{measurement['p50_ms']:>8.3f} {measurement['p99_ms']:>8.3f} {peak_text:>9}")
+
+            if factor != 1:
+                continue
+            if args.update_golden:
+                normalized = {event_id: normalize(result) for event_id, result in results.items()}
+                golden[name] = {event_id: result for event_id, result in normalized.items() if result}
+                continue
+            mismatches = compare_with_golden(name, results, normalize, golden)
+            if mismatches is None:
+                print(f"{name:<12} no golden output in {args.golden}")
+            elif mismatches:
+                failures += 1
+                print(f"{name:<12} GOLDEN MISMATCH on {len(mismatches)} rows, e.g. ids {', '.join(mismatches[:10])}")
+
+    if args.update_golden:
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(golden, f, ensure_ascii=False, indent=0, sort_keys=True)
+            f.write("\n")
+        print(f"Golden output written to {args.golden}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if profiler.enabled:
+        profiler.write(args.profile)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import re
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+
+_whitespace_pattern = re.compile(r"\s+")
+
+
+def normalize_description(text):
+    """
+    Normalizes a description so that trivially different copies of the same text share a cache entry.
+
+    Args:
+        text (str): The raw description.
+
+    Returns:
+        str: The NFC-normalized text with runs of whitespace collapsed to a single space.
+    """
+    text = unicodedata.normalize("NFC", text)
+    return _whitespace_pattern.sub(" ", text).strip()
+
+
+def description_key(text):
+    """
+    Computes the content address of a description.
+
+    Args:
+        text (str): The raw description.
+
+    Returns:
+        str: The hex SHA-256 digest of the normalized description.
+    """
+    return hashlib.sha256(normalize_description(text).encode("utf-8")).hexdigest()
+
+
+class DescriptionCache(object):
+    '''
+    Runs an extraction function once per distinct description and fans the result back out.
+
+    Results are keyed by the hash of the normalized description, so the 4,957 rows of the
+    Supabase export only cost 674 extractions. With store_path set, results are also kept
+    in a SQLite file so later runs only extract new or changed descriptions. Results must
+    be JSON-serializable to be persisted, or be converted to and from JSON values by the
+    encode/decode functions. max_entries bounds the in-memory layer (least
+    recently used entries are evicted) so streaming runs keep a flat memory profile.
+    '''
+
+    def __init__(self, extract_fn, namespace, store_path=None, default=None, max_entries=None, encode=None, decode=None):
+        self.extract_fn = extract_fn
+        self.encode = encode
+        self.decode = decode
+        # Different extractors can share one store without their results colliding
+        self.namespace = namespace
+        self.default = default
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        if store_path:
+            self.connection = sqlite3.connect(store_path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                "namespace TEXT NOT NULL, digest TEXT NOT NULL, result TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, digest))"
+            )
+
+    def _load(self, digest):
+        if self.connection is None:
+            return None
+        row = self.connection.execute(
+            "SELECT result FROM extractions WHERE namespace = ? AND digest = ?",
+            (self.namespace, digest),
+        ).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        return result if self.decode is None else self.decode(result)
+
+    def _save(self, digest, result):
+        if self.connection is None:
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions (namespace, digest, result) VALUES (?, ?, ?)",
+            (self.namespace, digest, json.dumps(result if self.encode is None else self.encode(result), ensure_ascii=False)),
+        )
+
+    def get(self, text):
+        """
+        Returns the extraction result for one description, running the extractor only on a cache miss.
+
+        Args:
+            text (str): The raw description. Non-string values (None, NaN) return the default.
+
+        Returns:
+            The extractor's result for the normalized description.
+        """
+        if not isinstance(text, str):
+            return self.default
+        normalized = normalize_description(text)
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        if digest in self.memory:
+            self.hits += 1
+            self.memory.move_to_end(digest)
+            return self.memory[digest]
+        result = self._load(digest)
+        if result is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            result = self.extract_fn(normalized)
+            self._save(digest, result)
+        self._remember(digest, result)
+        return result
+
+    def _remember(self, digest, result):
+        self.memory[digest] = result
+        if self.max_entries is not None and len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def extract_all(self, texts, batch_fn=None):
+        """
+        Extracts every description, running each distinct text once.
+
+        Args:
+            texts (iterable): Descriptions in row order (a list or a pandas Series).
+            batch_fn (function): Optional function extracting a list of normalized texts in one
+                call (e.g. a process pool). Only the distinct texts missing from the cache are sent.
+
+        Returns:
+            list: The results in the same order as texts.
+        """
+        if batch_fn is None:
+            results = [self.get(text) for text in texts]
+        else:
+            results = self._extract_batched(texts, batch_fn)
+        self.commit()
+        return results
+
+    def _extract_batched(self, texts, batch_fn):
+        digests = []
+        found = {}
+        pending = {}
+        for text in texts:
+            if not isinstance(text, str):
+                digests.append(None)
+                continue
+            normalized = normalize_description(text)
+            digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+            digests.append(digest)
+            if digest in found or digest in pending:
+                self.hits += 1
+            elif digest in self.memory:
+                self.hits += 1
+                found[digest] = self.memory[digest]
+            else:
+                result = self._load(digest)
+                if result is not None:
+                    self.hits += 1
+                    found[digest] = result
+                    self._remember(digest, found[digest])
+                else:
+                    pending[digest] = normalized
+        if pending:
+            self.misses += len(pending)
+            for digest, result in zip(pending, batch_fn(list(pending.values()))):
+                found[digest] = result
+                self._save(digest, result)
+                self._remember(digest, result)
+        return [found[digest] if digest is not None else self.default for digest in digests]
+
+    def commit(self):
+        if self.connection is not None:
+            self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self.memory)}
@@ -0,0 +1,86 @@
+import re
+
+from schedule_lexer import days_fr, months_fr
+
+# Row classes
+NO_TIME = "no_time"       # no hour together with a day: extract_schedule can only return an empty schedule
+ONE_OFF = "one_off"       # names an event keyword or a date, and nothing recurring
+RECURRING = "recurring"   # everything else: worth the full extraction
+
+_days = "|".join(days_fr)
+_initials = "".join(sorted({day[0] for day in days_fr} | {"t"}))
+
+# Every time the lexer and the rule table read has an "h" after its hour digits ("17h", "9 h 30"),
+# so a description without one can't hold a time
+hour_pattern = re.compile(r"\d\s*h", re.IGNORECASE)
+# Every assigned slot goes to days named in the text, or to all days after "tous les jours"
+day_pattern = re.compile(rf"(?=[{_initials}])(?:{_days}|tous\s+les\s+jours)", re.IGNORECASE)
+
+
+class EventClassifier(object):
+    '''
+    Sorts descriptions into NO_TIME, ONE_OFF and RECURRING before the schedule extraction.
+
+    The no-time check is two short regex searches that usually stop early. The full
+    classification then scans the text once with a single alternation of the event keywords, date
+    patterns and recurrence cues ("tous les", "chaque", plural day names, "du lundi au vendredi").
+    '''
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        # Longest first, so "fête de la nature" is reported rather than a shorter keyword it contains
+        keyword_alternatives = "|".join(re.escape(keyword) for keyword in sorted(self.keywords, key=len, reverse=True))
+        self.pattern = re.compile(
+            rf"(?P<keyword>{keyword_alternatives})"
+            rf"|(?P<date>\b\d{{1,2}}(?:er)?\s+(?:{'|'.join(months_fr)})\b|\b\d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?\b)"
+            rf"|(?P<recurring>\btous\s+les\b|\bchaque\b|\b(?:{_days})s\b|\b(?:{_days})\s+au\s+(?:{_days})\b)",
+            re.IGNORECASE,
+        )
+
+    def has_time(self, text):
+        """
+        Tells whether a description can hold a weekly schedule at all.
+
+        Args:
+            text (str): The description.
+
+        Returns:
+            bool: False when extract_schedule is certain to return an empty schedule.
+        """
+        return hour_pattern.search(text) is not None and day_pattern.search(text) is not None
+
+    def scan(self, text):
+        """
+        Returns:
+            dict: "keywords" (the event keywords found, lowercase), "dates" (the number of dates
+            found) and "recurring" (whether a recurrence cue was found).
+        """
+        keywords = []
+        dates = 0
+        recurring = False
+        for m in self.pattern.finditer(text):
+            kind = m.lastgroup
+            if kind == "keyword":
+                keywords.append(m.group().lower())
+            elif kind == "date":
+                dates += 1
+            else:
+                recurring = True
+        return {"keywords": keywords, "dates": dates, "recurring": recurring}
+
+    def classify(self, text):
+        """
+        Classifies a description.
+
+        Args:
+            text (str): The description.
+
+        Returns:
+            str: NO_TIME, ONE_OFF or RECURRING.
+        """
+        if not self.has_time(text):
+            return NO_TIME
+        found = self.scan(text)
+        if (found["keywords"] or found["dates"]) and not found["recurring"]:
+            return ONE_OFF
+        return RECURRING
@@ -1,19 +1,62 @@
+import argparse
+import os
 import pandas as pd
 from extractor import TimeExtractor
+from description_cache import DescriptionCache
+from parallel_extract import extract_parallel, format_timings
+from profiling import add_profile_arguments, profiler
 
-# Load CSV
-df = pd.read_csv(r"C:\Users\victo\Desktop\CS\Job\timeextractor\Supabase_Snippet_Event_Management_Table.csv")
+project_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(project_dir, "Supabase_Snippet_Event_Management_Table.csv")
 
-# Init extractor
-extractor = TimeExtractor()
+# One extractor per process, created on first use so worker processes build their own
+extractor = None
 
 def extract_time(text):
-    if pd.isna(text):
-        return None
+    global extractor
+    if extractor is None:
+        extractor = TimeExtractor()
     result = extractor.extract(text)
     return [r.datetime.isoformat() for r in result if r.datetime]
 
-df["extracted_times"] = df["description"].apply(extract_time)
 
-df.to_csv("extracted_times_output.csv", index=False)
-print("✅ Extraction complete.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract datetimes from the descriptions of an event CSV export.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV)
+    parser.add_argument("-o", "--output", default="extracted_times_output.csv")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Descriptions per worker task")
+    parser.add_argument("--cache", metavar="PATH", help="SQLite file persisting extractions across runs (off by default)")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiler.enable(args.profile_slowest)
+
+    # Load CSV
+    with profiler.stage("read_input"):
+        df = pd.read_csv(args.input)
+
+    batch_fn = None
+    if args.workers != 1:
+        def batch_fn(batch):
+            # Worker processes don't report to the profiler, so the whole batch is one stage
+            with profiler.stage("extract_parallel"):
+                results, timings = extract_parallel(batch, extract_time, args.workers or None, args.chunk_size)
+            print(format_timings(timings))
+            return results
+
+    # Each distinct description is extracted once; with --cache, results persist across runs in the SQLite store
+    cache = DescriptionCache(profiler.profiled(extract_time), "extract_from_csv/v1", store_path=args.cache)
+    df["extracted_times"] = cache.extract_all(df["description"], batch_fn)
+    cache.close()
+
+    with profiler.stage("write"):
+        df.to_csv(args.output, index=False)
+    print("✅ Extraction complete.")
+    if profiler.enabled:
+        profiler.set_counts("cache_lookups", {"hit": cache.hits, "miss": cache.misses})
+        profiler.write(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,93 @@
+import argparse
+import os
 import re
-import pandas as pd
 from datetime import datetime
+from description_cache import DescriptionCache
+from incremental import Manifest, iter_export_rows, patch_csv, sync
+from profiling import add_profile_arguments, profiler
+from parallel_extract import extract_parallel, format_timings
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(project_dir, "Supabase_Snippet_Event_Management_Table.csv")
+
+days_of_week = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+
+# A time or a range such as "10h", "9h30", "14:00", "10h à 12h" or "8h-13h"
+_time = r"\d{1,2}[h:]\d{2}|\d{1,2}h?"
+
+# Times per day, in days_of_week order: a tuple of seven tuples of time strings
+NO_TIMES = ((),) * len(days_of_week)
+
+
+class HoursDaysExtractor(object):
+    '''
+    Finds the times given for each day of the week in a description.
+
+    All patterns are compiled once into a single alternation, so a description is scanned in
+    one finditer pass: "<day> <time>[ à|- <time>]" pairs, and "du <day> au <day>, de <time> à <time>"
+    ranges (only the first range of a description is used, and its times come after the times
+    given for single days).
+    '''
+
+    def __init__(self, days=days_of_week):
+        self.days = list(days)
+        self.day_index = {day: i for i, day in enumerate(self.days)}
+        day_names = "|".join(self.days)
+        initials = "".join(sorted({day[0] for day in self.days} | {"d"}))
+        # The lookahead on the possible first letters lets the scan skip most positions without
+        # trying every alternative
+        self.pattern = re.compile(
+            rf"(?=[{initials}])(?:(?P<range>du\s*(?P<range_from>{day_names})\s*au\s*(?P<range_to>{day_names}),\s*"
+            rf"de\s*(?P<range_start>{_time})\s*à\s*(?P<range_end>{_time}))"
+            rf"|(?P<day>{day_names})\s*(?P<start>{_time})\s*(?:à|-)?\s*(?P<end>{_time})?)",
+            re.IGNORECASE,
+        )
+
+    def extract(self, text):
+        """
+        Extracts the times given for each day.
+
+        Args:
+            text (str): The text to extract time information from.
+
+        Returns:
+            tuple: Seven tuples (lundi first) of times such as "10h" or "10h-12h". Texts without
+            any time share the NO_TIMES constant.
+        """
+        times = None
+        first_range = None
+        for m in self.pattern.finditer(text):
+            day = m.group("day")
+            if day is None:
+                if first_range is None:
+                    first_range = m
+                continue
+            if times is None:
+                times = [[] for _ in self.days]
+            start, end = m.group("start", "end")
+            times[self.day_index[day.lower()]].append(f"{start}-{end}" if end else start)
+        if first_range is not None:
+            start_index = self.day_index[first_range.group("range_from").lower()]
+            end_index = self.day_index[first_range.group("range_to").lower()]
+            if start_index <= end_index and times is None:
+                times = [[] for _ in self.days]
+            for i in range(start_index, end_index + 1):
+                times[i].append(f"{first_range.group('range_start')}-{first_range.group('range_end')}")
+        if times is None:
+            return NO_TIMES
+        return tuple(map(tuple, times))
+
+    def as_daily_times(self, times):
+        return {day: list(day_times) for day, day_times in zip(self.days, times)}
+
+
+hours_days_extractor = HoursDaysExtractor()
+
+
+def extract_hours(text):
+    # Module-level so it can be sent to worker processes
+    return hours_days_extractor.extract(text)
+
 
 def extract_times_by_day(text):
     """
@@ -12,75 +99,240 @@ def extract_times_by_day(text):
     Returns:
         dict: A dictionary where keys are days of the week and values are lists of times.
     """
+    return hours_days_extractor.as_daily_times(hours_days_extractor.extract(text))
 
-    days_of_week = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
-    daily_times = {}
 
-    for day in days_of_week:
-        daily_times[day] = []
+# Function to format the output as a string
+def format_times(times):
+    # Accepts the compact tuples from extract_hours as well as extract_times_by_day dicts
+    items = times.items() if isinstance(times, dict) else zip(days_of_week, times)
+    output = ""
+    for day, day_times in items:
+        if day_times:
+            output += f"{day}: {', '.join(day_times)}\n"
+    return output
+
 
-    # Regex to find times, including ranges and specific times
-    time_regex = r"(\d{1,2}[h:]\d{2}|\d{1,2}h?)\s*(?:à|-)?\s*(\d{1,2}[h:]\d{2}|\d{1,2}h?)?"
+# Order given to range times so they sort after the times given for single days
+_RANGE_ORDER = 2 ** 62
 
-    for day in days_of_week:
-        # Find times mentioned for each day
-        matches = re.findall(rf"{day}\s*{time_regex}", text, re.IGNORECASE)
-        for match in matches:
-            time1 = match[0]
-            time2 = match[1] if match[1] else ""  # Use empty string if no second time
 
-            if time2:
-                daily_times[day].append(f"{time1}-{time2}")  # Store time range
-            else:
-                daily_times[day].append(time1)  # Store single time
+def _as_string_series(descriptions):
+    try:
+        return descriptions.astype("string[pyarrow]")
+    except ImportError:
+        return descriptions.astype("string")
 
 
-     #Find opening hours mentioned for "Du ... au ..." like "Du mardi au samedi, de 10h à 18h."
-    matches = re.findall(rf"du\s*({days_of_week[0]}|{days_of_week[1]}|{days_of_week[2]}|{days_of_week[3]}|{days_of_week[4]}|{days_of_week[5]}|{days_of_week[6]})\s*au\s*({days_of_week[0]}|{days_of_week[1]}|{days_of_week[2]}|{days_of_week[3]}|{days_of_week[4]}|{days_of_week[5]}|{days_of_week[6]}),\s*de\s*(\d{{1,2}}[h:]\d{{2}}|\d{{1,2}}h?)\s*à\s*(\d{{1,2}}[h:]\d{{2}}|\d{{1,2}}h?)", text, re.IGNORECASE)
-    if matches:
-        start_day = matches[0][0].lower()
-        end_day = matches[0][1].lower()
-        start_time = matches[0][2]
-        end_time = matches[0][3]
+def extract_times_frame(descriptions, extractor=hours_days_extractor):
+    """
+    Vectorized extract_hours over a whole column: one extractall over the distinct descriptions,
+    then a pivot to one column per day.
 
-        start_index = days_of_week.index(start_day)
-        end_index = days_of_week.index(end_day)
+    Args:
+        descriptions (pandas.Series): The descriptions, in row order.
+        extractor (HoursDaysExtractor): Provides the compiled pattern and the day names.
 
-        for i in range(start_index, end_index + 1):
-            day = days_of_week[i]
-            daily_times[day].append(f"{start_time}-{end_time}")
+    Returns:
+        pandas.DataFrame: Indexed like descriptions, one string column per day of
+        extractor.days holding the comma-separated times (NA when none). Only rows with at
+        least one time are kept.
+    """
+    import pandas as pd
 
+    descriptions = _as_string_series(descriptions)
+    codes, uniques = pd.factorize(descriptions)
+    matches = pd.Series(uniques, dtype=descriptions.dtype).str.extractall(extractor.pattern)
+    empty = pd.DataFrame(columns=extractor.days, index=descriptions.index[:0], dtype="string")
+    if matches.empty:
+        return empty
 
+    texts = matches.index.get_level_values(0).to_numpy()
+    order = matches.index.get_level_values(1).to_numpy()
+    is_day = matches["day"].notna().to_numpy()
+    day_matches = matches[is_day]
+    start, end = day_matches["start"], day_matches["end"]
+    parts = [pd.DataFrame({
+        "text": texts[is_day],
+        "order": order[is_day],
+        "day": day_matches["day"].str.lower().to_numpy(dtype=object),
+        "time": start.where(end.isna(), start + "-" + end).to_numpy(dtype=object),
+    })]
 
-    return daily_times
+    # Only the first range of each description counts, and it covers every day from..to
+    ranges = matches[~is_day]
+    ranges = ranges[~ranges.index.get_level_values(0).duplicated()]
+    if len(ranges):
+        range_texts = ranges.index.get_level_values(0).to_numpy()
+        first = ranges["range_from"].str.lower().map(extractor.day_index).to_numpy(dtype="int64")
+        last = ranges["range_to"].str.lower().map(extractor.day_index).to_numpy(dtype="int64")
+        range_times = (ranges["range_start"] + "-" + ranges["range_end"]).to_numpy(dtype=object)
+        for i, day in enumerate(extractor.days):
+            covered = (first <= i) & (i <= last)
+            parts.append(pd.DataFrame({
+                "text": range_texts[covered],
+                "order": _RANGE_ORDER,
+                "day": day,
+                "time": range_times[covered],
+            }))
 
+    times = pd.concat(parts, ignore_index=True).sort_values(["text", "order"], kind="stable")
+    if times.empty:
+        return empty
+    wide = (times.groupby(["text", "day"], sort=False)["time"].agg(", ".join)
+            .unstack("day").reindex(columns=extractor.days).astype("string"))
+    # Back from distinct descriptions to rows; rows without a description (code -1) get no times
+    rows = wide.reindex(codes)
+    rows.index = descriptions.index
+    rows.columns.name = None
+    return rows.dropna(how="all")
 
-# Example usage with DataFrame
-csv_file = r'C:\Users\victo\Desktop\CS\Job\timeextractor\Supabase_Snippet_Event_Management_Table.csv'
-df = pd.read_csv(csv_file)
 
-# Assuming the text is in the second column (index 1)
-df['daily_times'] = df.iloc[:, 1].apply(extract_times_by_day)
+def format_times_frame(times):
+    """
+    Vectorized format_times over the output of extract_times_frame.
 
-# Function to format the output as a string
-def format_times(daily_times):
-    output = ""
-    for day, times in daily_times.items():
-        if times:
-            output += f"{day}: {', '.join(times)}\n"
-    return output
+    Returns:
+        pandas.Series: The "day: times" lines of each row, same text as format_times.
+    """
+    import pandas as pd
+
+    formatted = pd.Series("", index=times.index, dtype="string")
+    for day in times.columns:
+        formatted = formatted + (day + ": " + times[day] + "\n").fillna("")
+    return formatted
+
+
+def extract_all_times(texts, workers=1, chunk_size=500, cache_path=None):
+    """
+    Runs extract_hours over a column of descriptions, once per distinct text.
+
+    Args:
+        texts (iterable): The descriptions, in row order.
+        workers (int): Worker processes for the distinct texts; 1 extracts in this process.
+        chunk_size (int): Texts sent to a worker at a time.
+        cache_path (str): Optional SQLite file persisting extractions across runs.
+
+    Returns:
+        list: One tuple of seven per-day time tuples per text (see HoursDaysExtractor.extract).
+    """
+    cache = DescriptionCache(profiler.profiled(extract_hours), "extract_hours_days/v2", store_path=cache_path,
+                             default=NO_TIMES)
+    batch_fn = None
+    if workers != 1:
+        def batch_fn(batch):
+            # Worker processes don't report to the profiler, so the whole batch is one stage
+            with profiler.stage("extract_parallel"):
+                results, timings = extract_parallel(batch, extract_hours, workers, chunk_size)
+            print(format_timings(timings))
+            return results
+    try:
+        return cache.extract_all(texts, batch_fn)
+    finally:
+        cache.close()
+
+
+def run_incremental(input_path, output_path, manifest_path, cache_path=None):
+    """
+    Extracts only the rows inserted or changed since the last run and patches the output CSV.
+
+    Args:
+        input_path (str): The export, a CSV file or a SQLite database (see incremental.iter_export_rows).
+        output_path (str): The id,formatted_times CSV to patch.
+        manifest_path (str): The SQLite manifest of the last run.
+        cache_path (str): Optional SQLite file persisting extractions across runs.
+    """
+    cache = DescriptionCache(profiler.profiled(extract_hours), "extract_hours_days/v2", store_path=cache_path,
+                             default=NO_TIMES)
+    # JSON turns the tuples into lists
+    manifest = Manifest(manifest_path, cache.namespace, decode=lambda times: tuple(map(tuple, times)))
+    try:
+        with profiler.stage("sync"):
+            changes = sync(profiler.timed_iter("read_input", iter_export_rows(input_path)), manifest, extract_hours, cache)
+        with profiler.stage("write"):
+            patch_csv(output_path, changes, manifest,
+                      lambda id_val, times: [id_val, format_times(times)] if any(times) else None,
+                      header=["id", "formatted_times"])
+        manifest.commit()
+    finally:
+        manifest.close()
+        cache.close()
+    stats = changes.stats()
+    print(f"{stats['inserted']} inserted, {stats['changed']} changed, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged; {output_path} patched")
+
+
+def write_profile(path):
+    if profiler.enabled:
+        profiler.write(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract times per weekday from an event CSV export.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV)
+    parser.add_argument("-o", "--output", default=os.path.join(project_dir, "extracted_times_formatted.csv"))
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Descriptions per worker task")
+    parser.add_argument("--cache", metavar="PATH", help="SQLite file persisting extractions across runs (off by default)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Extract with pandas string operations over the whole column instead of row by row "
+                             "(ignores --workers and --cache)")
+    parser.add_argument("--incremental", metavar="MANIFEST",
+                        help="SQLite manifest of the last run: only extract new and changed rows and patch --output. "
+                             "The input can then also be a SQLite database with an events table.")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiler.enable(args.profile_slowest)
+
+    if args.incremental:
+        run_incremental(args.input, args.output, args.incremental, args.cache)
+        write_profile(args.profile)
+        return
+
+    # Imported here rather than at the top: the worker processes and the callers of extract_hours
+    # import this module without needing pandas, which takes longer to import than everything else
+    import pandas as pd
+
+    if args.vectorized:
+        # The C parser, since descriptions contain quoted line breaks the pyarrow parser rejects
+        with profiler.stage("read_input"):
+            df = pd.read_csv(args.input)
+        with profiler.stage("extract_frame"):
+            times = extract_times_frame(df.iloc[:, 1])
+        # Rows without times are already left out of the per-day frame, no string filtering needed
+        with profiler.stage("format"):
+            df_output = pd.DataFrame({"id": df.loc[times.index, "id"], "formatted_times": format_times_frame(times)})
+        with profiler.stage("write"):
+            df_output.to_csv(args.output, index=False)
+        print(f"Extracted and formatted times exported to {args.output}")
+        write_profile(args.profile)
+        return
+
+    with profiler.stage("read_input"):
+        df = pd.read_csv(args.input)
+
+    # Assuming the text is in the second column (index 1)
+    # Each distinct description is extracted once; with --cache, results persist across runs in the SQLite store
+    df['daily_times'] = extract_all_times(df.iloc[:, 1], args.workers or None, args.chunk_size, args.cache)
+
+    # Apply the function to create a formatted string
+    with profiler.stage("format"):
+        df['formatted_times'] = df['daily_times'].apply(format_times)
+
+    # Filter rows where there are any times
+    df_filtered = df[df['formatted_times'] != ""]  # Keep rows where formatted_times is not empty
 
-# Apply the function to create a formatted string
-df['formatted_times'] = df['daily_times'].apply(format_times)
+    # Select only the id and the formatted_times columns
+    df_output = df_filtered[['id', 'formatted_times']]
 
-# Filter rows where there are any times
-df_filtered = df[df['formatted_times'] != ""]  # Keep rows where formatted_times is not empty
+    # Export to a CSV file
+    with profiler.stage("write"):
+        df_output.to_csv(args.output, index=False)
 
-# Select only the id and the formatted_times columns
-df_output = df_filtered[['id', 'formatted_times']]
+    print(f"Extracted and formatted times exported to {args.output}")
+    write_profile(args.profile)
 
-# Export to a CSV file
-output_csv_file = r'C:\Users\victo\Desktop\CS\Job\timeextractor\extracted_times_formatted.csv'
-df_output.to_csv(output_csv_file, index=False)
 
-print(f"Extracted and formatted times exported to {output_csv_file}")
+if __name__ == "__main__":
+    main()
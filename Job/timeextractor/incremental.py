@@ -0,0 +1,271 @@
+"""
+Incremental re-extraction: only the rows inserted or changed since the last run are extracted.
+
+A manifest (SQLite) keeps id -> description hash -> extraction result for every row of the last
+export. Each run diffs the new export against it, extracts the new and changed descriptions,
+forgets the deleted ids and patches the existing output file instead of rewriting it from scratch.
+
+The export is a CSV file or, as a local stand-in for the Supabase table, a SQLite database with
+an events table (see iter_export_rows).
+"""
+import csv
+import json
+import os
+import sqlite3
+
+from description_cache import DescriptionCache, description_key
+
+# Digest recorded for rows without a description
+NO_DESCRIPTION = ""
+
+
+def iter_export_rows(path, id_column="id", description_column="description", table="events"):
+    """
+    Streams (id, description) pairs from an export.
+
+    Args:
+        path (str): A CSV file, or a SQLite database (.sqlite, .sqlite3, .db) holding the table.
+        id_column (str): The id column.
+        description_column (str): The description column.
+        table (str): The table read from a SQLite database.
+
+    Yields:
+        tuple: (id, description). Numeric ids are returned as int, rows without an id are skipped.
+    """
+    if path.endswith((".sqlite", ".sqlite3", ".db")):
+        connection = sqlite3.connect(path)
+        try:
+            # Identifiers can't be bound as parameters; quote them instead
+            quote = lambda name: '"' + name.replace('"', '""') + '"'
+            query = f"SELECT {quote(id_column)}, {quote(description_column)} FROM {quote(table)}"
+            for id_val, description in connection.execute(query):
+                if id_val is not None:
+                    yield _as_id(id_val), description
+        finally:
+            connection.close()
+        return
+    csv.field_size_limit(2 ** 31 - 1)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(id_column):
+                yield _as_id(row[id_column]), row.get(description_column)
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class Manifest(object):
+    '''
+    id -> (description digest, extraction result) of the rows of the last export, in a SQLite file.
+
+    Entries are kept per namespace, like DescriptionCache, so bumping an extractor's namespace
+    re-extracts every row. Results go through encode/decode to be stored as JSON.
+    '''
+
+    def __init__(self, path, namespace, encode=None, decode=None):
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS manifest ("
+            "namespace TEXT NOT NULL, id NOT NULL, digest TEXT NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, id))"
+        )
+
+    def digests(self):
+        return dict(self.connection.execute(
+            "SELECT id, digest FROM manifest WHERE namespace = ?", (self.namespace,)))
+
+    def results(self):
+        """
+        Yields:
+            tuple: (id, result) of every row, ordered by id.
+        """
+        rows = self.connection.execute(
+            "SELECT id, result FROM manifest WHERE namespace = ? ORDER BY id", (self.namespace,))
+        for id_val, result in rows:
+            result = json.loads(result)
+            yield id_val, result if self.decode is None else self.decode(result)
+
+    def update(self, upserts, deleted):
+        """
+        Records a run's changes. They are only saved by commit(), so callers commit once the
+        output is patched and a failed run leaves the manifest matching the old output.
+
+        Args:
+            upserts (dict): id -> (digest, result) of the inserted and changed rows.
+            deleted (iterable): Ids no longer in the export.
+        """
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO manifest (namespace, id, digest, result) VALUES (?, ?, ?, ?)",
+            ((self.namespace, id_val, digest,
+              json.dumps(result if self.encode is None else self.encode(result), ensure_ascii=False))
+             for id_val, (digest, result) in upserts.items()),
+        )
+        self.connection.executemany(
+            "DELETE FROM manifest WHERE namespace = ? AND id = ?", ((self.namespace, id_val) for id_val in deleted))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class ChangeSet(object):
+    '''
+    What one run found in the export compared to the manifest.
+    '''
+
+    def __init__(self, results, deleted, inserted, changed, unchanged, first_run):
+        # id -> new result, for the inserted and changed rows
+        self.results = results
+        self.deleted = deleted
+        self.inserted = inserted
+        self.changed = changed
+        self.unchanged = unchanged
+        # The manifest was empty, so an existing output can't be trusted to match it
+        self.first_run = first_run
+
+    def stats(self):
+        return {"inserted": self.inserted, "changed": self.changed, "deleted": len(self.deleted),
+                "unchanged": self.unchanged}
+
+
+def sync(rows, manifest, extract_fn, cache=None):
+    """
+    Diffs an export against the manifest, extracts the new and changed rows and updates the manifest
+    (without committing it, see Manifest.update).
+
+    Args:
+        rows (iterable): (id, description) pairs of the whole export.
+        manifest (Manifest): The manifest of the previous run.
+        extract_fn (function): The extractor, taking one normalized description.
+        cache (DescriptionCache): Optional cache the changed descriptions are extracted through,
+            e.g. one with a store shared with full runs. Defaults to an in-memory cache, so a
+            description shared by several changed rows is still extracted once.
+
+    Returns:
+        ChangeSet: The changes, with the new results.
+    """
+    known = manifest.digests()
+    seen = set()
+    pending = {}
+    unchanged = 0
+    for id_val, description in rows:
+        if id_val in seen:
+            continue
+        seen.add(id_val)
+        digest = description_key(description) if isinstance(description, str) else NO_DESCRIPTION
+        if known.get(id_val) == digest:
+            unchanged += 1
+        else:
+            pending[id_val] = (digest, description)
+    deleted = [id_val for id_val in known if id_val not in seen]
+
+    if cache is None:
+        cache = DescriptionCache(extract_fn, "incremental")
+    results = cache.extract_all([description for _, description in pending.values()])
+    upserts = {id_val: (digest, result) for (id_val, (digest, _)), result in zip(pending.items(), results)}
+    manifest.update(upserts, deleted)
+
+    inserted = sum(1 for id_val in pending if id_val not in known)
+    return ChangeSet({id_val: result for id_val, (_, result) in upserts.items()}, deleted,
+                     inserted, len(pending) - inserted, unchanged, first_run=not known)
+
+
+def _patched(records, changes, to_record):
+    # records: (id as text, record) pairs of the existing output, in file order
+    replacements = {str(id_val): (id_val, result) for id_val, result in changes.results.items()}
+    dropped = {str(id_val) for id_val in changes.deleted}
+    for key, record in records:
+        if key in dropped:
+            continue
+        if key in replacements:
+            record = to_record(*replacements.pop(key))
+            if record is None:
+                continue
+        yield record
+    # New ids, and changed ids that had no output row before, go at the end
+    for id_val, result in replacements.values():
+        record = to_record(id_val, result)
+        if record is not None:
+            yield record
+
+
+def _all_results(changes, manifest):
+    # On a first run every row is in the change set, in export order; otherwise rebuild from the manifest
+    return changes.results.items() if changes.first_run else manifest.results()
+
+
+def _replace(path, write_fn):
+    # Written next to the output and renamed over it, so an interrupted run leaves the old output intact
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+def patch_ndjson(path, changes, manifest, to_record):
+    """
+    Applies a ChangeSet to an NDJSON output with one {"id": ...} object per line.
+
+    Changed rows are rewritten where they are, new rows are appended. When the output doesn't
+    exist yet or the manifest was empty, the whole output is written from the manifest.
+
+    Args:
+        path (str): The output file.
+        changes (ChangeSet): Output of sync.
+        manifest (Manifest): The updated manifest.
+        to_record (function): (id, result) -> the JSON object written, or None to leave the row out.
+    """
+    if changes.first_run or not os.path.exists(path):
+        records = (to_record(id_val, result) for id_val, result in _all_results(changes, manifest))
+    else:
+        def read():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield str(record["id"]), record
+        records = _patched(read(), changes, to_record)
+        # Read fully before the rename replaces the file
+        records = list(records)
+
+    def write(f):
+        for record in records:
+            if record is not None:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _replace(path, write)
+
+
+def patch_csv(path, changes, manifest, to_row, header):
+    """
+    Applies a ChangeSet to a CSV output whose first column is the id. See patch_ndjson.
+
+    Args:
+        to_row (function): (id, result) -> the list of values written, or None to leave the row out.
+        header (list): The column names, written when the output is rebuilt.
+    """
+    if changes.first_run or not os.path.exists(path):
+        rows = (to_row(id_val, result) for id_val, result in _all_results(changes, manifest))
+    else:
+        csv.field_size_limit(2 ** 31 - 1)
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, header)
+            rows = list(_patched(((row[0], row) for row in reader if row), changes, to_row))
+
+    def write(f):
+        # Same line endings as pandas' to_csv, so patched and fully written files look alike
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(row for row in rows if row is not None)
+    _replace(path, write)
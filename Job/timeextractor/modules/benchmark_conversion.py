@@ -0,0 +1,92 @@
+'''
+Micro-benchmark of the Python -> Java conversion used to build Settings.
+
+Compares JavaComposite with a copy of the previous isinstance-chain converter on settings shaped
+like PySettings kwargs with long rule lists. Run from this directory (it starts the JVM):
+
+    python benchmark_conversion.py --rules 5000 --repeat 5
+'''
+import argparse
+import timeit
+from numbers import Number
+from collections.abc import Iterable, Mapping
+
+import extractor
+
+# The legacy converter below reads the Java classes as globals, which exist once the JVM is started
+extractor.init()
+from extractor import JavaComposite, MetaJavaClass, jMap, jArrayList, jInt, jLong, jFloat, jDouble, jString, jBoolean
+
+
+class LegacyJavaComposite(object):
+    # The converter as it was before the dispatch table: isinstance chain per element
+    # and the Java limits read through JNI on every number.
+
+    def primitive(self, obj, isValue):
+        if isinstance(obj, int):
+            if isinstance(obj, bool):
+                javaObj, attr = jBoolean(obj), 'booleanValue'
+            elif obj <= jInt.MAX_VALUE:
+                javaObj, attr = jInt(obj), 'intValue'
+            else:
+                javaObj, attr = jLong(obj), 'longValue'
+        elif isinstance(obj, float):
+            if obj < jFloat.MAX_VALUE:
+                javaObj, attr = jFloat(obj), 'floatValue'
+            else:
+                javaObj, attr = jDouble(obj), 'doubleValue'
+        elif isinstance(obj, str):
+            return jString(obj)
+        else:
+            return None
+        return getattr(javaObj, attr)() if isValue else javaObj
+
+    def __call__(self, obj, isValue=False):
+        if isinstance(obj, (Number, str)):
+            return self.primitive(obj, isValue)
+        elif isinstance(obj.__class__, MetaJavaClass):
+            return obj
+        elif isinstance(obj, Mapping):
+            HashMap = jMap()
+            for key, value in obj.items():
+                HashMap.put(self(key, isValue), self(value, isValue=False))
+            return HashMap
+        elif isinstance(obj, Iterable):
+            JavaArrayList = jArrayList()
+            for element in obj:
+                JavaArrayList.add(self(element))
+            return JavaArrayList
+        else:
+            return jString(str(obj))
+
+
+def build_settings_kwargs(rules):
+    return {
+        'date': "2017-10-23T18:40:40.931Z",
+        'timezoneOffset': "100",
+        'rulesToIgnore': [f"ignoredRule{i}" for i in range(rules // 10)],
+        'rulesToInclude': [f"rule{i}" for i in range(rules)],
+        'includeOnlyLatestDates': True,
+        'weights': [i * 0.5 for i in range(rules // 10)],
+        'limits': {f"rule{i}": i for i in range(rules // 10)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Python -> Java settings conversion.")
+    parser.add_argument("--rules", type=int, default=5000, help="Length of rulesToInclude.")
+    parser.add_argument("--repeat", type=int, default=5, help="Conversions timed per converter (best is reported).")
+    args = parser.parse_args(argv)
+
+    kwargs = build_settings_kwargs(args.rules)
+    converters = [("legacy", LegacyJavaComposite()), ("dispatch table", JavaComposite())]
+    best = {}
+    for name, converter in converters:
+        converter(kwargs)  # warm up: class lookups, cached limits, type table
+        best[name] = min(timeit.repeat(lambda: converter(kwargs), number=1, repeat=args.repeat))
+        print(f"{name:>15}: {best[name] * 1000:.1f} ms per conversion")
+    print(f"speedup: {best['legacy'] / best['dispatch table']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,105 +1,354 @@
 import os
 import json
+import struct
+import threading
+import time
 from numbers import Number
 from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from operator import itemgetter
 
 # Adjust this import for absolute import or ensure relative import works
 from config import set_class_path, JavaSettingsConstructorParams
-set_class_path()
-
-from jnius import autoclass, MetaJavaClass
-
-# Java DataTypes
-jMap = autoclass('java.util.HashMap')
-jArrayList = autoclass('java.util.ArrayList')
-jList = autoclass('java.util.List')
-jInt = autoclass('java.lang.Integer')
-jLong = autoclass('java.lang.Long')
-jFloat = autoclass('java.lang.Float')
-jDouble = autoclass('java.lang.Double')
-jString = autoclass('java.lang.String')
-jBoolean = autoclass('java.lang.Boolean')
-
-# Custom Java Classes
-Settings = autoclass('ai.digamma.entities.Settings')
-Service = autoclass('ai.digamma.service.DateTimeExtractor')
-SettingsBuilder = autoclass('ai.digamma.utils.SettingsBuilder')
+
+WARMUP_TEXT = "10-15 month"
+
+_float32 = struct.Struct('f')
+
+
+class ExtractorRuntime(object):
+    '''
+    Owns the JVM used by the extractor: starts it once, resolves the Java classes once and
+    keeps built Settings objects so they can be reused across calls and threads.
+
+    pyjnius attaches a Python thread to the JVM on its first Java call, but the thread has to
+    detach itself before it exits or the JVM keeps a dangling thread. Functions run on worker
+    threads should be wrapped with attached(), or go through extract_threaded().
+    '''
+    JavaClasses = {
+        # Java DataTypes
+        'HashMap': 'java.util.HashMap',
+        'ArrayList': 'java.util.ArrayList',
+        'Arrays': 'java.util.Arrays',
+        'List': 'java.util.List',
+        'Integer': 'java.lang.Integer',
+        'Long': 'java.lang.Long',
+        'Float': 'java.lang.Float',
+        'Double': 'java.lang.Double',
+        'String': 'java.lang.String',
+        'Boolean': 'java.lang.Boolean',
+        # Custom Java Classes
+        'Settings': 'ai.digamma.entities.Settings',
+        'Service': 'ai.digamma.service.DateTimeExtractor',
+        'SettingsBuilder': 'ai.digamma.utils.SettingsBuilder',
+    }
+
+    def __init__(self):
+        self.jnius = None
+        self.classes = {}
+        self.settingsCache = {}
+        self.timings = {}
+        self.ready = False
+        self.lock = threading.RLock()
+
+    def start(self, warmupText=WARMUP_TEXT):
+        '''
+        Start the JVM and resolve the Java classes. Only the first call does any work.
+        :param warmupText: text extracted once so the rule engine is loaded before the first real call,
+                           None to skip the warm-up
+        :return: the runtime itself
+        '''
+        if self.ready:
+            return self
+        with self.lock:
+            if self.ready:
+                return self
+            started = time.perf_counter()
+            set_class_path()
+            import jnius
+            self.jnius = jnius
+            jvmStarted = time.perf_counter()
+            self.classes = {name: jnius.autoclass(path) for name, path in self.JavaClasses.items()}
+            classesResolved = time.perf_counter()
+            if warmupText:
+                self.classes['Service'].extractJSON(warmupText)
+            warmedUp = time.perf_counter()
+            self.timings = {
+                'jvm': jvmStarted - started,
+                'classes': classesResolved - jvmStarted,
+                'warmup': warmedUp - classesResolved,
+                'total': warmedUp - started,
+            }
+            self.ready = True
+        return self
+
+    def java(self, name):
+        '''
+        Return a resolved Java class by its short name (see JavaClasses), starting the runtime if needed.
+        '''
+        return self.start().classes[name]
+
+    def settings(self, **kwargs):
+        '''
+        Return a PySettings built from kwargs, reusing the one built for the same kwargs earlier.
+        The returned object is shared: do not mutate it.
+        '''
+        key = json.dumps(kwargs, sort_keys=True, default=repr)
+        return self.cached_settings(key, lambda: PySettings(**kwargs))
+
+    def cached_settings(self, key, factory):
+        '''
+        Return the settings stored under key, calling factory() to build them on first use.
+        Useful to keep PySettingsBuilder chains from being rebuilt on every request.
+        :param key: any hashable naming the settings
+        :param factory: function returning PySettings or ai.digamma.entities.Settings
+        '''
+        settings = self.settingsCache.get(key)
+        if settings is None:
+            with self.lock:
+                settings = self.settingsCache.get(key)
+                if settings is None:
+                    settings = self.settingsCache[key] = factory()
+        return settings
+
+    def detach(self):
+        '''
+        Detach the calling thread from the JVM. Must not be called from the main thread.
+        '''
+        if self.jnius is not None and threading.current_thread() is not threading.main_thread():
+            self.jnius.detach()
+
+    def attached(self, function):
+        '''
+        Wrap a function run on a worker thread so the thread detaches from the JVM once it returns.
+        '''
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            self.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.detach()
+        return wrapper
+
+    def extract(self, text, settings=None):
+        self.start()
+        return ExtractionService.extract(text, settings)
+
+    def extract_threaded(self, texts, settings=None, workers=4):
+        '''
+        Extract from texts on a pool of threads, returning the results in input order.
+        Each thread handles a contiguous slice of texts and detaches from the JVM when done.
+        :param texts: list of str
+        :param settings: PySettings or ai.digamma.entities.Settings, optional
+        :param workers: number of threads
+        '''
+        self.start()
+        texts = list(texts)
+        if not texts:
+            return []
+        workers = max(1, min(workers, len(texts)))
+        sliceSize = -(-len(texts) // workers)
+        slices = [texts[i:i + sliceSize] for i in range(0, len(texts), sliceSize)]
+        extractSlice = self.attached(lambda chunk: list(ExtractionService.extract_many(chunk, settings)))
+        results = []
+        with ThreadPoolExecutor(max_workers=len(slices)) as pool:
+            for chunkResults in pool.map(extractSlice, slices):
+                results.extend(chunkResults)
+        return results
+
+
+# Importing this module does not start the JVM: init() does, on the first PySettings,
+# PySettingsBuilder or ExtractionService call or when called explicitly at startup
+runtime = ExtractorRuntime()
+MetaJavaClass = None
+
+# Java DataTypes, bound by init()
+jMap = jArrayList = jArrays = jList = None
+jInt = jLong = jFloat = jDouble = jString = jBoolean = None
+
+# Custom Java Classes, bound by init()
+Settings = Service = SettingsBuilder = None
+
+# module global -> short name in ExtractorRuntime.JavaClasses
+_javaGlobals = {
+    'jMap': 'HashMap', 'jArrayList': 'ArrayList', 'jArrays': 'Arrays', 'jList': 'List',
+    'jInt': 'Integer', 'jLong': 'Long', 'jFloat': 'Float', 'jDouble': 'Double',
+    'jString': 'String', 'jBoolean': 'Boolean',
+    'Settings': 'Settings', 'Service': 'Service', 'SettingsBuilder': 'SettingsBuilder',
+}
+
+
+def init(warmupText=WARMUP_TEXT):
+    '''
+    Start the JVM and bind the Java classes to this module's globals. Only the first call does any work.
+    Long-running processes can call it at startup so the first request doesn't pay for the JVM.
+    It also hands ExtractionService the extraction scripts' profiler (profiling.profiler) when that
+    module is importable and no profiler was set, so a script's --profile reports the Java steps.
+    :param warmupText: see ExtractorRuntime.start
+    :return: the runtime
+    '''
+    global MetaJavaClass
+    if MetaJavaClass is None:
+        with runtime.lock:
+            if MetaJavaClass is None:
+                if ExtractionService.profiler is None:
+                    try:
+                        from profiling import profiler
+                    except ImportError:
+                        pass
+                    else:
+                        ExtractionService.profiler = profiler
+                runtime.start(warmupText)
+                globals().update({name: runtime.classes[short] for name, short in _javaGlobals.items()})
+                PySettings.JavaSettings = Settings
+                PySettingsBuilder.JavaSettingsBuilder = SettingsBuilder
+                ExtractionService.JavaService = Service
+                # Set last: other threads read it without the lock to know the globals are bound
+                MetaJavaClass = runtime.jnius.MetaJavaClass
+    return runtime
 
 class JavaPrimitive(object):
     '''
-    Convert primitives to their corresponding Java-types based on size
+    Convert primitives to their corresponding Java-types based on size.
+    Converters are looked up by exact type, the Java limits are read from the JVM once, and
+    value conversions that round-trip to the same Python value skip the JNI call.
     '''
-    def __return_value(self, javaObj, isValue, attr):
-        if isValue:
-            return getattr(javaObj, attr)()
-        else:
-            return javaObj
+    def __init__(self):
+        self.intMax = None
+        self.floatMax = None
+        self.converters = {bool: self.__bool, int: self.__int, float: self.__float, str: self.__str}
 
-    def __call__(self, obj, isValue = False):
-        if isinstance(obj, int):
-            if isinstance(obj, bool):
-                return self.__return_value(jBoolean(obj), isValue, 'booleanValue')
+    def __load_limits(self):
+        self.intMax = jInt.MAX_VALUE
+        self.floatMax = jFloat.MAX_VALUE
 
-            if obj <= jInt.MAX_VALUE:
-                return self.__return_value(jInt(obj), isValue, 'intValue')
-            else:
-                return self.__return_value(jLong(obj), isValue, 'longValue')
+    def __bool(self, obj, isValue):
+        return obj if isValue else jBoolean(obj)
 
-        elif isinstance(obj, float):
-            if obj < jFloat.MAX_VALUE:
-                return self.__return_value(jFloat(obj), isValue, 'floatValue')
-            else:
-                return self.__return_value(jDouble(obj), isValue, 'doubleValue')
+    def __int(self, obj, isValue):
+        if isValue:
+            # Integer.intValue()/Long.longValue() give the same Python int back
+            return obj
+        if self.intMax is None:
+            self.__load_limits()
+        return jInt(obj) if obj <= self.intMax else jLong(obj)
+
+    def __float(self, obj, isValue):
+        if self.floatMax is None:
+            self.__load_limits()
+        if obj < self.floatMax:
+            if isValue:
+                # Same rounding as Float.floatValue(), without the JNI round trip
+                try:
+                    return _float32.unpack(_float32.pack(obj))[0]
+                except OverflowError:
+                    return jFloat(obj).floatValue()
+            return jFloat(obj)
+        return obj if isValue else jDouble(obj)
+
+    def __str(self, obj, isValue):
+        return jString(obj)
+
+    def converter_for(self, cls):
+        '''
+        Return the converter for a type, resolving subclasses (e.g. IntEnum) once per type.
+        Returns None for types without a Java primitive counterpart.
+        '''
+        converter = self.converters.get(cls)
+        if converter is None:
+            for base in (bool, int, float, str):
+                if issubclass(cls, base):
+                    converter = self.converters[cls] = self.converters[base]
+                    break
+        return converter
 
-        elif isinstance(obj, str):
-            return jString(obj)
+    def __call__(self, obj, isValue = False):
+        converter = self.converter_for(type(obj))
+        if converter is not None:
+            return converter(obj, isValue)
 
 class JavaComposite(object):
+    '''
+    Recursively convert Python objects to composite Java objects (e.g. Java Map<String, Object>).
+    The conversion for each type is resolved once and kept in a table, so nested elements cost a
+    dict lookup instead of a chain of isinstance and ABC checks. Lists whose elements all share
+    one type are converted in bulk.
+    '''
 
     def __init__(self):
         self.primitives = (Number, str)
         self.primitiveConverter = JavaPrimitive()
+        self.converters = {}
 
     def __call__(self, obj, isValue = False):
         '''
-        Recursively convert Python objects to composite Java objects (e.g. Java Map<String, Object>)
         :param obj: Python object
+        :param isValue: convert primitives to the Python value of their Java counterpart
         '''
-        try:
-            if isinstance(obj, self.primitives):
-                return self.primitiveConverter(obj, isValue)
-
-            elif isinstance(obj.__class__, MetaJavaClass):
-                return obj
-
-            elif isinstance(obj, Mapping):
-                HashMap = jMap()
-                for key, value in obj.items():
-                    hashMapKey = self(key, isValue)
-                    hashMapValue = self(value, isValue=False)
-                    HashMap.put(hashMapKey, hashMapValue)
-                return HashMap
-
-            elif isinstance(obj, Iterable):
-                JavaArrayList = jArrayList()
-                for element in obj:
-                    temp = self(element)
-                    JavaArrayList.add(temp)
+        cls = type(obj)
+        converter = self.converters.get(cls)
+        if converter is None:
+            converter = self.converters[cls] = self.__resolve(cls)
+        return converter(obj, isValue)
+
+    def __resolve(self, cls):
+        # The first conversion binds the Java classes the converters use
+        init()
+        if issubclass(cls, self.primitives):
+            return self.primitiveConverter
+        elif isinstance(cls, MetaJavaClass):
+            return self.__java_object
+        elif issubclass(cls, Mapping):
+            return self.__map
+        elif issubclass(cls, Iterable):
+            return self.__list
+        else:
+            return self.__other
+
+    def __java_object(self, obj, isValue):
+        return obj
+
+    def __map(self, obj, isValue):
+        HashMap = jMap()
+        put = HashMap.put
+        for key, value in obj.items():
+            put(self(key, isValue), self(value))
+        return HashMap
+
+    def __list(self, obj, isValue):
+        elements = obj if isinstance(obj, (list, tuple)) else list(obj)
+        if not elements:
+            return jArrayList()
+        elementType = type(elements[0])
+        if all(type(element) is elementType for element in elements):
+            if elementType is str:
+                # One JNI call for the whole list instead of one String and one add() per element
+                return jArrayList(jArrays.asList(*elements))
+            convert = self.primitiveConverter.converter_for(elementType)
+            if convert is not None:
+                JavaArrayList = jArrayList(len(elements))
+                add = JavaArrayList.add
+                for element in elements:
+                    add(convert(element, False))
                 return JavaArrayList
+        JavaArrayList = jArrayList(len(elements))
+        add = JavaArrayList.add
+        for element in elements:
+            add(self(element))
+        return JavaArrayList
 
-            else:
-                return jString(str(obj))
-        except Exception as e:
-            print(f"Error in JavaComposite: {repr(e)}")
-            raise e
+    def __other(self, obj, isValue):
+        return jString(str(obj))
 
 
 class PySettings(object):
-    JavaSettings = Settings
+    JavaSettings = None
     Converter = JavaComposite()
 
     def __init__(self, **kwargs):
+        init()
         self.kwargs = kwargs
         self.build_java_settings_obj()
 
@@ -113,15 +362,26 @@ class PySettings(object):
         else:
             self.javaSettingsObj = self.JavaSettings()
 
+    @classmethod
+    def wrap(cls, javaSettingsObj):
+        '''
+        Wrap an already built ai.digamma.entities.Settings without constructing a default one first.
+        '''
+        pySettings = cls.__new__(cls)
+        pySettings.kwargs = {}
+        pySettings.javaSettingsObj = javaSettingsObj
+        return pySettings
+
     def __call__(self):
         return self.javaSettingsObj
 
 
 class PySettingsBuilder(object):
-    JavaSettingsBuilder = SettingsBuilder
+    JavaSettingsBuilder = None
     Converter = JavaComposite()
 
     def __init__(self, javaBuilderObj=None):
+        init()
         self.javaBuilderObj = javaBuilderObj if javaBuilderObj else self.JavaSettingsBuilder()
 
     def __set_java_builder(self, newJavaBuilderObj):
@@ -129,13 +389,7 @@ class PySettingsBuilder(object):
         return self
 
     def build(self):
-        if self.javaBuilderObj is None:
-            print("javaBuilderObj is None!")
-        else:
-            print(f"javaBuilderObj: {self.javaBuilderObj}")
-        pySettings = PySettings()
-        pySettings.javaSettingsObj = self.javaBuilderObj.build()
-        return pySettings
+        return PySettings.wrap(self.javaBuilderObj.build())
 
     def __getattr__(self, attr):
         if hasattr(self.javaBuilderObj, attr):
@@ -149,43 +403,108 @@ class PySettingsBuilder(object):
         raise AttributeError(attr)
 
 
+def _no_lap(name):
+    pass
+
+
 class ExtractionService(object):
-    JavaService = Service
+    JavaService = None
     Converter = JavaComposite()
+    # An enabled profiling.Profiler times the conversion, extractJSON and JSON decode steps.
+    # init() sets the extraction scripts' profiler (enabled by their --profile); library callers
+    # without Job/timeextractor on sys.path opt in by setting their own before the first extraction.
+    profiler = None
+
+    @classmethod
+    def __laps(cls):
+        return cls.profiler.laps('java') if cls.profiler is not None else _no_lap
+
+    @classmethod
+    def __to_java_settings(cls, settings):
+        if not isinstance(settings, (PySettings, Settings)):
+            raise TypeError(f'Settings argument should be of type PySettings or ai.digamma.entities.Settings. Got {type(settings)} instead')
+        elif isinstance(settings, PySettings):
+            settings = settings()
+        return settings
 
     @classmethod
     def extract(cls, text, settings=None):
+        init()
         if not isinstance(text, (str, jString)):
             raise TypeError(f'Text argument should be of type str or java.lang.String. Got {type(text)} instead')
+        lap = cls.__laps()
         if settings:
-            if not isinstance(settings, (PySettings, Settings)):
-                raise TypeError(f'Settings argument should be of type PySettings or ai.digamma.entities.Settings. Got {type(settings)} instead')
-            elif isinstance(settings, PySettings):
-                settings = settings()
+            settings = cls.__to_java_settings(settings)
             ServiceParams = (cls.Converter(text), cls.Converter(settings))
         else:
             ServiceParams = (cls.Converter(text),)
+        lap('convert')
         rez = cls.JavaService.extractJSON(*ServiceParams)
-        return json.loads(rez)
+        lap('extractJSON')
+        result = json.loads(rez)
+        lap('json_decode')
+        return result
+
+    @classmethod
+    def extract_many(cls, texts, settings=None, batch_size=1000):
+        '''
+        Extract from many texts, yielding one decoded result per text in input order.
+
+        texts can be any iterable, including a generator: it is consumed batch_size texts at a
+        time, so memory stays bounded however many texts are streamed through. The settings are
+        converted once for all texts, strings go to Java without an intermediate JavaComposite
+        conversion, and every batch of JSON replies is decoded by a single json.loads call.
+        The jar only exposes a per-text extractJSON (and the file-based extractJSONFromCsv), so
+        there is still one JNI call per text.
+        :param texts: iterable of str
+        :param settings: PySettings or ai.digamma.entities.Settings, optional
+        :param batch_size: number of texts buffered and decoded together
+        '''
+        init()
+        if settings:
+            settings = cls.__to_java_settings(settings)
+        batch = []
+        for text in texts:
+            if not isinstance(text, (str, jString)):
+                raise TypeError(f'Text argument should be of type str or java.lang.String. Got {type(text)} instead')
+            batch.append(text)
+            if len(batch) >= batch_size:
+                yield from cls.__extract_batch(batch, settings)
+                batch = []
+        if batch:
+            yield from cls.__extract_batch(batch, settings)
+
+    @classmethod
+    def __extract_batch(cls, batch, settings):
+        extractJSON = cls.JavaService.extractJSON
+        lap = cls.__laps()
+        if settings:
+            replies = [extractJSON(text, settings) for text in batch]
+        else:
+            replies = [extractJSON(text) for text in batch]
+        lap('extractJSON')
+        results = json.loads('[' + ','.join(replies) + ']')
+        lap('json_decode')
+        return results
 
     @classmethod
     def extractFromCsv(cls, csvPath, outputPath, settings, separator=','):
-        if not isinstance(settings, (PySettings, Settings)):
-            raise TypeError(f'Settings argument should be of type PySettings or ai.digamma.entities.Settings. Got {type(settings)} instead')
-        elif isinstance(settings, PySettings):
-            settings = settings()
+        init()
+        settings = cls.__to_java_settings(settings)
         rez = cls.JavaService.extractJSONFromCsv(csvPath, separator, outputPath, settings)
         return json.loads(rez)
 
 if __name__ == '__main__':
-    settings = (PySettingsBuilder()
+    init()
+    print(f"runtime ready in {runtime.timings['total']:.2f}s: {runtime.timings}")
+    settings = runtime.cached_settings('duration', lambda: (PySettingsBuilder()
                 .addRulesGroup('DurationGroup')
                 .excludeRules("holidaysRule")
                 .addUserDate("2017-10-23T18:40:40.931Z")
                 .addTimeZoneOffset("100")
                 .includeOnlyLatestDates(True)
                 .build()
-                )
+                ))
     text = "10-15 month"
-    rez = ExtractionService.extract(text, settings)
+    rez = runtime.extract(text, settings)
     print(rez)
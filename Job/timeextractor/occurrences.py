@@ -0,0 +1,607 @@
+"""
+Occurrence engine for dated schedules: turns a description into compact recurrence rules and
+expands them lazily into concrete occurrences over a requested window.
+
+    Juillet : 08/07 & 29/07 de 9h à 11h ; 16/07 de 18h à 20h     -> DateList rules
+    Tous les samedis de 10h à 12h à partir du 5 avril             -> Weekly rule from April 5th
+    Du 5 avril au 18 mai 2025 ... tous les jours de 8h à 20h      -> Weekly rule bounded by the range
+    d'avril à octobre, les mardis de 10h à 12h                    -> Weekly rule, April 1st to October 31st
+    de 6h30 à 13h : du 1er avril au 30 septembre : tous les jours
+                    d'octobre à mars : tous les jeudis et dimanches  -> one Weekly rule per season
+
+Rules only hold dates and minutes; occurrences are generated one at a time, so expanding every
+event of the export over a year never holds more than one pending occurrence per event.
+
+    python occurrences.py --from 2025-07-01 --to 2025-07-31 --year 2025 -o july.ndjson
+    python occurrences.py --check      # checks the examples of EXAMPLES
+"""
+import argparse
+import calendar
+import csv
+import heapq
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from output_time_json import extract_schedule
+from schedule import days_en
+from schedule_lexer import DAY_RANGE, EVERY, SEPARATOR, days_fr, tokenize
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Supabase_Snippet_Event_Management_Table.csv")
+
+# end is None for a time given without an end ("à 20h")
+Occurrence = namedtuple("Occurrence", ["start", "end"])
+
+months = {name: i for i, name in enumerate(
+    ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre",
+     "novembre", "décembre"], start=1)}
+months.update({"fevrier": 2, "aout": 8, "decembre": 12})
+_month = "(?:" + "|".join(sorted(months, key=len, reverse=True)) + ")"
+_weekday = r"(?:lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche)"
+
+# "16/07", "16/07/2025"
+numeric_date_pattern = re.compile(r"(?<![\d/])(?P<d>\d{1,2})/(?P<m>\d{1,2})(?:/(?P<y>\d{2}|\d{4}))?(?![\d/])")
+# "16 juillet", "1er avril 2025", and lists of days sharing the month: "Les 2, 12 et 24 juin", "5 , 12 & 19 avril"
+# (no word boundary before the first day: "Les2, 12 et 24 juin" happens)
+named_date_pattern = re.compile(
+    rf"(?<![\d/:])(?P<d>\d{{1,2}}(?:er)?(?:\s*(?:,|&|\bet\b)\s*\d{{1,2}}(?:er)?)*)\s+(?P<m>{_month})\b(?:\s+(?P<y>\d{{4}}))?",
+    re.IGNORECASE)
+_day_number = re.compile(r"\d{1,2}")
+# "à partir du 1er avril", "dès le 05/07", "jusqu'au 30 septembre 2025": bounds of a schedule, not occurrence dates
+bound_pattern = re.compile(
+    rf"(?:(?P<from>\b(?:à|a)\s+partir\s+du|\bdès\s+le)|(?P<until>\bjusqu['’]\s*au))\s+(?:{_weekday}\s+)?"
+    rf"(?P<date>\d{{1,2}}/\d{{1,2}}(?:/(?:\d{{4}}|\d{{2}}))?(?![\d/])|\d{{1,2}}(?:er)?\s+{_month}\b(?:\s+\d{{4}})?)",
+    re.IGNORECASE)
+# "du 14 au 27 avril", "du samedi 19 avril au lundi 21 avril", "du 21/06 au 05/07", "d'avril à octobre"
+range_patterns = [
+    re.compile(rf"\bdu\s+(?:{_weekday}\s+)?(?P<d1>\d{{1,2}})(?:er)?(?:\s+(?P<m1>{_month}))?(?:\s+(?P<y1>\d{{4}}))?"
+               rf"\s+au\s+(?:{_weekday}\s+)?(?P<d2>\d{{1,2}})(?:er)?\s+(?P<m2>{_month})\b(?:\s+(?P<y2>\d{{4}}))?",
+               re.IGNORECASE),
+    re.compile(r"\bdu\s+(?P<d1>\d{1,2})/(?P<m1>\d{1,2})(?:/(?P<y1>\d{2}|\d{4}))?"
+               r"\s+au\s+(?P<d2>\d{1,2})/(?P<m2>\d{1,2})(?:/(?P<y2>\d{2}|\d{4}))?(?![\d/])", re.IGNORECASE),
+    re.compile(rf"(?:\bd['’]\s*|\bde\s+)(?P<m1>{_month})\s+à\s+(?P<m2>{_month})\b", re.IGNORECASE),
+]
+# "9h", "9h30 à 11h30", "18h-20h"
+time_pattern = re.compile(
+    r"(?<![\d/:])(?P<sh>\d{1,2})\s*h\s*(?P<sm>\d{2})?(?:\s*(?:-|à|–|/)\s*(?P<eh>\d{1,2})\s*h\s*(?P<em>\d{2})?)?",
+    re.IGNORECASE)
+_weekday_pattern = re.compile(rf"\b({_weekday})s?\b", re.IGNORECASE)
+_weekday_numbers = {day: i for i, day in enumerate(days_fr)}
+
+
+class Weekly(object):
+    '''
+    Every week on the given weekdays (0 is Monday), at the given times, optionally between two dates.
+    '''
+    __slots__ = ("weekdays", "times", "first", "last")
+
+    def __init__(self, weekdays, times, first=None, last=None):
+        self.weekdays = tuple(sorted(weekdays))
+        self.times = tuple(sorted(times, key=lambda t: (t[0], t[1] is None, t[1])))
+        self.first = first
+        self.last = last
+
+    def occurrences(self, start, end):
+        """
+        Yields the occurrences between two dates, in chronological order.
+
+        Args:
+            start (date): First day of the window.
+            end (date): Last day of the window, included.
+        """
+        day = max(start, self.first) if self.first else start
+        last = min(end, self.last) if self.last else end
+        weekdays = set(self.weekdays)
+        while day <= last:
+            if day.weekday() in weekdays:
+                yield from _at_times(day, self.times)
+            day += timedelta(days=1)
+
+    def to_dict(self):
+        return {"weekly": [days_en[day] for day in self.weekdays], "times": [list(t) for t in self.times],
+                "from": self.first and self.first.isoformat(), "until": self.last and self.last.isoformat()}
+
+    def __repr__(self):
+        return f"Weekly({self.to_dict()!r})"
+
+
+class DateList(object):
+    '''
+    Explicit dates, each at the given times.
+    '''
+    __slots__ = ("dates", "times")
+
+    def __init__(self, dates, times):
+        self.dates = tuple(sorted(set(dates)))
+        self.times = tuple(sorted(times, key=lambda t: (t[0], t[1] is None, t[1])))
+
+    def occurrences(self, start, end):
+        for day in self.dates:
+            if day > end:
+                return
+            if day >= start:
+                yield from _at_times(day, self.times)
+
+    def to_dict(self):
+        return {"dates": [day.isoformat() for day in self.dates], "times": [list(t) for t in self.times]}
+
+    def __repr__(self):
+        return f"DateList({self.to_dict()!r})"
+
+
+def _at_times(day, times):
+    midnight = datetime(day.year, day.month, day.day)
+    for start, end in times:
+        if end is not None and end < start:
+            # "de 22h à 2h" ends the next day
+            end += 24 * 60
+        yield Occurrence(midnight + timedelta(minutes=start), None if end is None else midnight + timedelta(minutes=end))
+
+
+def _month_number(text):
+    return int(text) if text.isdigit() else months[text.lower()]
+
+
+def _year(text, default):
+    if not text:
+        return default
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def find_date_ranges(text, year):
+    """
+    Finds the date ranges of a description.
+
+    Args:
+        text (str): The description.
+        year (int): Year of the dates that don't give one.
+
+    Returns:
+        list: (first date, last date, (start offset, end offset)) tuples in text order. A range
+        whose end comes before its start ("d'octobre à mai") ends the next year. A range
+        overlapping one found earlier in the text is left out.
+    """
+    ranges = []
+    for pattern in range_patterns:
+        for m in pattern.finditer(text):
+            groups = m.groupdict()
+            m1, m2 = _month_number(groups["m1"] or groups["m2"]), _month_number(groups["m2"])
+            y2 = _year(groups.get("y2"), year)
+            y1 = _year(groups.get("y1"), y2 if groups.get("y2") else year)
+            d1 = int(groups.get("d1") or 1)
+            d2 = int(groups["d2"]) if groups.get("d2") else calendar.monthrange(y2, m2)[1]
+            first, last = _date(y1, m1, d1), _date(y2, m2, d2)
+            if first is None or last is None:
+                continue
+            if last < first:
+                if groups.get("y1"):
+                    continue
+                if groups.get("y2"):
+                    first = _date(y1 - 1, m1, d1)
+                else:
+                    last = _date(y2 + 1, m2, d2 if groups.get("d2") else calendar.monthrange(y2 + 1, m2)[1])
+                if first is None or last is None:
+                    continue
+            ranges.append((first, last, m.span()))
+    kept = []
+    for found in sorted(ranges, key=lambda found: found[2]):
+        if not kept or found[2][0] >= kept[-1][2][1]:
+            kept.append(found)
+    return kept
+
+
+def find_dates(text, year, exclude=()):
+    """
+    Finds the single dates of a description segment ("16/07", "16 juillet 2025", "9 et 23 avril").
+
+    Args:
+        text (str): The segment.
+        year (int): Year of the dates that don't give one.
+        exclude (list): (start, end) offsets to ignore, e.g. the date ranges.
+
+    Returns:
+        list: The dates, in text order.
+    """
+    found = []
+    for pattern in (numeric_date_pattern, named_date_pattern):
+        for m in pattern.finditer(text):
+            if any(start <= m.start() < end for start, end in exclude):
+                continue
+            date_year, month = _year(m.group("y"), year), _month_number(m.group("m"))
+            for number in _day_number.finditer(m.group("d")):
+                day = _date(date_year, month, int(number.group()))
+                if day is not None:
+                    found.append((m.start() + number.start(), day))
+    return [day for _, day in sorted(found)]
+
+
+def find_bounds(text, year):
+    """
+    Finds the "à partir du <date>" / "jusqu'au <date>" qualifiers of a description.
+
+    Args:
+        text (str): The description.
+        year (int): Year of the dates that don't give one.
+
+    Returns:
+        list: ("from" or "until", date, (start offset, end offset), parenthesized) tuples in text
+        order. parenthesized is True for a qualifier inside parentheses, which qualifies the
+        times next to it ("13h30 à 17h (14h à 17h30 à partir du 1er avril)") rather than the schedule.
+    """
+    bounds = []
+    for m in bound_pattern.finditer(text):
+        dates = find_dates(m.group("date"), year)
+        if not dates:
+            continue
+        before = text[:m.start()]
+        bounds.append(("from" if m.group("from") else "until", dates[0], m.span(), before.count("(") > before.count(")")))
+    return bounds
+
+
+def find_times(text):
+    """
+    Returns:
+        list: (start, end) minutes since midnight of every time or time range, end None for a single time.
+    """
+    times = []
+    for m in time_pattern.finditer(text):
+        start = int(m.group("sh")) * 60 + int(m.group("sm") or 0)
+        end = int(m.group("eh")) * 60 + int(m.group("em") or 0) if m.group("eh") else None
+        if start <= 24 * 60 and (end is None or end <= 24 * 60):
+            times.append((start, end))
+    return times
+
+
+def segments(description):
+    """
+    Splits a description at the lexer's SEPARATOR tokens (";", "|" and line breaks).
+
+    Yields:
+        tuple: (offset of the segment in the description, segment).
+    """
+    position = 0
+    for token in tokenize(description, keep_lines=True):
+        if token.kind == SEPARATOR:
+            yield position, description[position:token.start]
+            position = token.end
+    yield position, description[position:]
+
+
+def clause_weekdays(text):
+    """
+    Reads the weekdays a clause names: "tous les jours", "du mardi au samedi", "les jeudis et dimanches".
+
+    Returns:
+        set: Weekday numbers (0 is Monday), empty when the clause names none.
+    """
+    weekdays = set()
+    covered = []
+    for token in tokenize(text):
+        if token.kind in (EVERY, DAY_RANGE):
+            weekdays.update(_weekday_numbers[day] for day in token.value)
+            covered.append((token.start, token.end))
+    for m in _weekday_pattern.finditer(text):
+        if not any(start <= m.start() < end for start, end in covered):
+            weekdays.add(_weekday_numbers[m.group(1).lower()])
+    return weekdays
+
+
+def _outside(text, spans):
+    # The text with the spans blanked out, offsets unchanged
+    for start, end in spans:
+        text = text[:start] + " " * (end - start) + text[end:]
+    return text
+
+
+def _weekly_rules(schedule, first=None, last=None):
+    # Days with the same intervals share one rule
+    by_times = {}
+    for weekday, day in enumerate(days_en):
+        intervals = tuple(schedule.intervals(day))
+        if intervals:
+            by_times.setdefault(intervals, []).append(weekday)
+    return [Weekly(weekdays, intervals, first, last) for intervals, weekdays in by_times.items()]
+
+
+def season_rules(description, ranges):
+    """
+    Reads one season per date range from the range's clause, the text up to the next range:
+
+        de 6h30 à 13h : du 1er avril au 30 septembre : tous les jours
+                        d'octobre à mars : tous les jeudis et dimanches
+
+    A clause holding a weekly schedule gives its Weekly rules. Otherwise the clause's weekdays
+    (every day when it names none) are taken at the clause's times, or at the times given
+    before the first range, or failing that anywhere outside the ranges.
+
+    Args:
+        description (str): The event description.
+        ranges (list): Its date ranges, see find_date_ranges.
+
+    Returns:
+        list: Weekly rules, each bounded by its range. Empty when no clause names weekdays, so a
+        single range whose schedule is given elsewhere goes through extract_schedule instead.
+    """
+    if not ranges:
+        return []
+    range_spans = [span for _, _, span in ranges]
+    shared_times = find_times(description[:range_spans[0][0]]) or find_times(_outside(description, range_spans))
+    rules = []
+    named_weekdays = False
+    for i, (first, last, (_, clause_start)) in enumerate(ranges):
+        clause_end = range_spans[i + 1][0] if i + 1 < len(ranges) else len(description)
+        clause = description[clause_start:clause_end]
+        schedule = extract_schedule(clause)
+        if schedule:
+            rules += _weekly_rules(schedule, first, last)
+            named_weekdays = True
+            continue
+        weekdays = clause_weekdays(clause)
+        named_weekdays = named_weekdays or bool(weekdays)
+        times = find_times(clause) or shared_times
+        if times:
+            rules.append(Weekly(weekdays or range(7), times, first, last))
+    return rules if named_weekdays else []
+
+
+def recurrences(description, year=None):
+    """
+    Turns a description into recurrence rules.
+
+    Segments (see segments) naming dates become DateList rules, with the times of the part
+    (or of the next part when it only gives times). "à partir du <date>" and "jusqu'au <date>"
+    (see find_bounds) aren't occurrence dates, unless the description gives nothing else. The
+    rest of the description gives the weekly rules: each date range whose clause names weekdays
+    becomes a season of Weekly rules (see season_rules). Otherwise the weekly schedule found by
+    extract_schedule becomes Weekly rules, bounded by the first date range, or else by the
+    qualifiers outside parentheses. Failing that, a date range with a time is on the weekdays
+    named outside the range ("d'avril à octobre, les mardis de 10h à 12h"), or every day when
+    none is named.
+
+    Args:
+        description (str): The event description.
+        year (int): Year of the dates that don't give one. Defaults to the current year.
+
+    Returns:
+        list: DateList rules, then Weekly rules; empty when the description gives no usable time.
+    """
+    if not isinstance(description, str):
+        return []
+    year = year or date.today().year
+    ranges = find_date_ranges(description, year)
+    bounds = find_bounds(description, year)
+    # "dès le vendredi 16 mai à 17h" with no schedule to bound is the event's date
+    return _recurrences(description, year, ranges, bounds) or (bounds and _recurrences(description, year, ranges, []))
+
+
+def _recurrences(description, year, ranges, bounds):
+    range_spans = [span for _, _, span in ranges]
+    bound_spans = [span for _, _, span, _ in bounds]
+    rules = []
+    # Segments whose dates and times went into a DateList, left out of the weekly rules
+    used = []
+    pending_dates = []
+    pending_span = None
+    for position, segment in segments(description):
+        end = position + len(segment)
+        spans = [(start - position, stop - position) for start, stop in range_spans + bound_spans]
+        dates = find_dates(segment, year, spans)
+        # Times are read from the whole segment: a range's bounds are dates, never "18h"
+        times = find_times(segment)
+        # "les mercredis, à partir du 28 mai, à 15h45": the times of a bounded schedule
+        bounded = any(position <= start < end for start, _ in bound_spans)
+        if dates and times:
+            rules.append(DateList(dates, times))
+            used.append((position, end))
+            pending_dates = []
+        elif dates:
+            pending_dates, pending_span = dates, (position, end)
+        elif times and pending_dates and not bounded:
+            rules.append(DateList(pending_dates, times))
+            used += [pending_span, (position, end)]
+            pending_dates = []
+        elif segment.strip():
+            pending_dates = []
+    return rules + weekly_rules(_outside(description, used), ranges, bounds, schedule_only=bool(rules))
+
+
+def weekly_rules(description, ranges, bounds=(), schedule_only=False):
+    """
+    Reads the weekly part of a description, see recurrences.
+
+    Args:
+        description (str): The description, without the text of its DateList rules.
+        ranges (list): Its date ranges, see find_date_ranges.
+        bounds (list): Its qualifiers, see find_bounds.
+        schedule_only (bool): Only read a weekly schedule, without the seasons and the range
+            fallback, whose loose times would mostly be the DateLists' leftovers.
+
+    Returns:
+        list: Weekly rules.
+    """
+    rules = [] if schedule_only else season_rules(description, ranges)
+    if rules:
+        return rules
+    range_spans = [span for _, _, span in ranges]
+    if ranges:
+        first, last = ranges[0][0], ranges[0][1]
+    else:
+        first = next((day for kind, day, _, parenthesized in bounds if kind == "from" and not parenthesized), None)
+        last = next((day for kind, day, _, parenthesized in bounds if kind == "until" and not parenthesized), None)
+    # Without the ranges, whose weekdays ("du samedi 19 avril au lundi 21 avril") aren't a weekly
+    # schedule, nor the qualifiers ("dès le vendredi 16 mai")
+    schedule = extract_schedule(_outside(description, range_spans + [span for _, _, span, _ in bounds]))
+    if schedule:
+        return _weekly_rules(schedule, first, last)
+    if ranges and not schedule_only:
+        outside = _outside(description, range_spans)
+        times = find_times(outside)
+        if times:
+            return [Weekly(clause_weekdays(outside) or range(7), times[:1], first, last)]
+    return []
+
+
+def expand(rules, start, end):
+    """
+    Merges the occurrences of several rules in chronological order, lazily.
+
+    Args:
+        rules (list): Weekly and DateList rules.
+        start (date): First day of the window.
+        end (date): Last day of the window, included.
+
+    Yields:
+        Occurrence: (start datetime, end datetime or None).
+    """
+    return heapq.merge(*(rule.occurrences(start, end) for rule in rules), key=lambda occurrence: occurrence.start)
+
+
+def expand_events(events, start, end):
+    """
+    Merges the occurrences of many events in chronological order, one pending occurrence per event.
+
+    Args:
+        events (iterable): (event id, rules) pairs.
+        start (date): First day of the window.
+        end (date): Last day of the window, included.
+
+    Yields:
+        tuple: (start datetime, end datetime or None, event id).
+    """
+    def tagged(event_id, rules):
+        for occurrence in expand(rules, start, end):
+            yield occurrence.start, occurrence.end, event_id
+    return heapq.merge(*(tagged(event_id, rules) for event_id, rules in events),
+                       key=lambda occurrence: occurrence[0])
+
+
+# (description, year, expected rules, occurrences between April 1st of year and March 31st of the next)
+EXAMPLES = [
+    # Event 20: two seasons sharing the time given before them
+    ("Marché traditionnel, de 6h30 à 13h, place de la République : \n   > du 1er avril au 30 septembre : tous les jours"
+     "\n   > d'octobre à mars : tous les jeudis et dimanches", 2025,
+     [{"weekly": days_en, "times": [[390, 780]], "from": "2025-04-01", "until": "2025-09-30"},
+      {"weekly": ["thursday", "sunday"], "times": [[390, 780]], "from": "2025-10-01", "until": "2026-03-31"}],
+     183 + 52),
+    ("d'avril à octobre, les mardis de 10h à 12h", 2025,
+     [{"weekly": ["tuesday"], "times": [[600, 720]], "from": "2025-04-01", "until": "2025-10-31"}], 31),
+    ("Juillet : 08/07 & 29/07 de 9h à 11h ; 16/07 de 18h à 20h", 2025,
+     [{"dates": ["2025-07-08", "2025-07-29"], "times": [[540, 660]]},
+      {"dates": ["2025-07-16"], "times": [[1080, 1200]]}], 3),
+    ("Soirée le 5 juillet de 22h à 2h", 2025, [{"dates": ["2025-07-05"], "times": [[1320, 120]]}], 1),
+    # Days sharing one month (events 6386, 7588 and 4999)
+    ("Land'Art\nLes2, 12 et 24 juin\nde 14h30 à 16h30", 2025,
+     [{"dates": ["2025-06-02", "2025-06-12", "2025-06-24"], "times": [[870, 990]]}], 3),
+    ("Samedi 5 , 12 , 19 , 26 avril a 10h30.", 2025,
+     [{"dates": ["2025-04-05", "2025-04-12", "2025-04-19", "2025-04-26"], "times": [[630, None]]}], 4),
+    ("Mercredis 26 mars, 9 et 23 avril, 21 mai, 4 et 18 juin\nde 14h30 à 16h", 2025,
+     [{"dates": ["2025-03-26", "2025-04-09", "2025-04-23", "2025-05-21", "2025-06-04", "2025-06-18"],
+       "times": [[870, 960]]}], 5),
+    # "à partir du" / "jusqu'au" bound the weekly schedule instead of being dates (event 1037)
+    ("Tous les samedis de 10h à 12h à partir du 5 avril", 2025,
+     [{"weekly": ["saturday"], "times": [[600, 720]], "from": "2025-04-05", "until": None}], 52),
+    ("Tous les mercredis de 14h à 16h jusqu'au 25 juin", 2025,
+     [{"weekly": ["wednesday"], "times": [[840, 960]], "from": None, "until": "2025-06-25"}], 13),
+    # A date next to a weekly schedule keeps both (event 4999)
+    ("Vernissage le vendredi 4 juillet à 18h30\nOuvert du mardi au samedi de 14h à 18h", 2025,
+     [{"dates": ["2025-07-04"], "times": [[1110, None]]},
+      {"weekly": ["tuesday", "wednesday", "thursday", "friday", "saturday"], "times": [[840, 1080]],
+       "from": None, "until": None}], 1 + 261),
+]
+
+
+def check_examples():
+    """
+    Checks the rules and occurrences of EXAMPLES.
+
+    Returns:
+        list: A message per failed example, empty when they all pass.
+    """
+    failures = []
+    for description, year, expected_rules, expected_count in EXAMPLES:
+        rules = recurrences(description, year)
+        found_rules = [rule.to_dict() for rule in rules]
+        if found_rules != expected_rules:
+            failures.append(f"{description!r}: expected rules {expected_rules}, got {found_rules}")
+            continue
+        occurrences = list(expand(rules, date(year, 4, 1), date(year + 1, 3, 31)))
+        if len(occurrences) != expected_count:
+            failures.append(f"{description!r}: expected {expected_count} occurrences, got {len(occurrences)}")
+        backwards = [occurrence for occurrence in occurrences if occurrence.end is not None and occurrence.end <= occurrence.start]
+        if backwards:
+            failures.append(f"{description!r}: occurrence ending before it starts: {backwards[0]}")
+    return failures
+
+
+def iter_event_rules(csv_file, year=None, ids=None):
+    """
+    Yields:
+        tuple: (event id, rules) for every row of the export with at least one rule. Identical
+        descriptions are parsed once.
+    """
+    csv.field_size_limit(2 ** 31 - 1)
+    parsed = {}
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                event_id = int(row["id"])
+            except (TypeError, ValueError):
+                continue
+            if ids and event_id not in ids:
+                continue
+            description = row["description"] or ""
+            if description not in parsed:
+                parsed[description] = recurrences(description, year)
+            if parsed[description]:
+                yield event_id, parsed[description]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expand the dated and weekly schedules of an event CSV export into occurrences.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=date.today(), help="First day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day, YYYY-MM-DD. Defaults to 30 days after --from.")
+    parser.add_argument("--year", type=int, help="Year of the dates that don't give one. Defaults to the year of --from.")
+    parser.add_argument("--id", type=int, action="append", dest="ids", help="Only these event ids (repeatable)")
+    parser.add_argument("--rules", action="store_true", help="Print the rules of each event instead of the occurrences")
+    parser.add_argument("-o", "--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--check", action="store_true", help="Check the built-in examples and exit (non-zero on failure)")
+    args = parser.parse_args(argv)
+    if args.check:
+        failures = check_examples()
+        print("\n".join(failures) or f"{len(EXAMPLES)} examples ok", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+    end = args.end or args.start + timedelta(days=30)
+
+    events = iter_event_rules(args.input, args.year or args.start.year, set(args.ids or ()))
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    count = 0
+    try:
+        if args.rules:
+            for event_id, rules in events:
+                output.write(json.dumps({"id": event_id, "rules": [rule.to_dict() for rule in rules]}, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            for occurrence_start, occurrence_end, event_id in expand_events(list(events), args.start, end):
+                output.write(json.dumps({"id": event_id, "start": occurrence_start.isoformat(),
+                                         "end": occurrence_end and occurrence_end.isoformat()}) + "\n")
+                count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{count} {'events' if args.rules else 'occurrences'} written", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
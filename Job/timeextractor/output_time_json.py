@@ -1,28 +1,29 @@
-import re
+import argparse
+import csv
+import heapq
+from bisect import bisect_left, bisect_right
 import json
-
-def format_time(hour, minute):
-    h = int(hour)
-    m = int(minute) if minute and minute.isdigit() else 0
-    return f"{h:02d}:{m:02d}:00"
+import os
+import sys
+from operator import attrgetter
+from description_cache import DescriptionCache
+from event_classifier import NO_TIME, ONE_OFF, EventClassifier
+from incremental import Manifest, iter_export_rows, patch_ndjson, sync
+from profiling import add_profile_arguments, profiler
+from schedule import Schedule
+from schedule_lexer import DAY, DAY_RANGE, EVERY, TIME, TIME_RANGE, tokenize
+from schedule_rules import RuleMatch, RuleSet
+
+def parse_minute(minute):
+    return int(minute) if minute and minute.isdigit() else 0
 
 def assign_time(schedule, day_en, start_h, start_m, end_h, end_m):
     if not start_h or not start_h.isdigit(): return
 
-    start_hour_int = int(start_h)
-    start_time_str = format_time(start_h, start_m)
-    # Determine AM/PM for start time
-    start_key_am_pm = "pm" if start_hour_int >= 12 else "am"
-    start_key = f"{day_en}_start_hour_{start_key_am_pm}"
-    schedule[start_key] = start_time_str
-
+    # The schedule picks the am/pm slot from the hour. 12:00 is an AM end, 12:01 onwards is PM.
+    schedule.set_start(day_en, int(start_h), parse_minute(start_m))
     if end_h and end_h.isdigit():
-        end_hour_int = int(end_h)
-        end_time_str = format_time(end_h, end_m)
-        # Determine AM/PM for end time. 12:00 is AM, 12:01 onwards is PM.
-        end_key_am_pm = "pm" if end_hour_int > 12 or (end_hour_int == 12 and end_m and int(end_m) > 0) else "am"
-        end_key = f"{day_en}_end_hour_{end_key_am_pm}"
-        schedule[end_key] = end_time_str
+        schedule.set_end(day_en, int(end_h), parse_minute(end_m))
 
 day_map = {
     "lundi": "monday", "mardi": "tuesday", "mercredi": "wednesday",
@@ -32,111 +33,21 @@ day_map = {
 days_fr = list(day_map.keys())
 days_en = list(day_map.values())
 
-# Regex patterns
-# Time range like 8h - 13h, 8h-13h, 8h à 13h, 8h/13h, 10h30 à 12h30, 11 à 12h
-time_range_pattern = re.compile(
-    r"""
-    (?:de\s+|dès\s*)?(\d{1,2})\s*h\s*(?:(\d{2}))? # Start hour (1) and optional minute (2)
-    \s*(?:-|à|/|–|et)\s* # Separator
-    (\d{1,2})\s*h\s*(?:(\d{2}))? # End hour (3) and optional minute (4)
-    """, re.IGNORECASE | re.VERBOSE
-)
-# Single time like à 17h, 18h30
-single_time_pattern = re.compile(
-    r"""
-    (?:à|:|Dès)\s*(\d{1,2})\s*h\s*(?:(\d{2}))? # Hour (1) and optional minute (2)
-    (?!\s*(?:-|à|/|–|et)\s*\d{1,2}\s*h) # Negative lookahead to ensure it's not the start of a range
-    """, re.IGNORECASE | re.VERBOSE
-)
-# Time range like 11 à 12h (without explicit 'h' on first number) - handled by time_range_pattern with optional 'h' marker adjustment needed if causes issues
-# Let's refine time_range_pattern slightly
-time_range_pattern = re.compile(
-    r"""
-    (?:de\s+|dès\s*)?(\d{1,2})\s*h?\s*(?:(\d{2}))? # Start hour (1) and optional minute (2), optional h
-    \s*(?:-|à|/|–|et|puis\s+de)\s* # Separator
-    (\d{1,2})\s*h\s*(?:(\d{2}))? # End hour (3) and optional minute (4)
-    """, re.IGNORECASE | re.VERBOSE
-)
-
-# Day patterns
-day_pattern_text = r'\b(' + '|'.join(days_fr) + r')\b'
-day_pattern = re.compile(day_pattern_text, re.IGNORECASE)
-tous_les_jours_pattern = re.compile(r'\b(tous\s+les\s+jours)\b', re.IGNORECASE)
-tous_les_day_pattern = re.compile(r'\b(tous\s+les\s+(' + '|'.join(d + 's' for d in days_fr) + r'))\b', re.IGNORECASE)
-day_range_pattern = re.compile(r'\bdu\s+(lundi|mardi)\s+au\s+(vendredi|samedi)\b', re.IGNORECASE)
-
-input_text = """
-3109,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-3114,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-9891,"Visite guidée ""L'art de la pêche palavasienne"" [...] Octobre : 28/10 de 14h30 à 16h30"
-2263,"de 6h à 13h30[...]Mercredi :  parking [...] toute l'année[...]Vendredi :  promenade [...] toute l'année[...]Dimanche : parking [...] de mi-juin à fin août[...]"
-5103,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-5105,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-10246,"De 9h30 à 11h00 : Châteaux de sable [...] du samedi 19 avril au lundi 21 avril !"
-1419,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-5369,"[...] 9h30 : Courses enfants [...] 10h30 : Courses 5 km [...]"
-5017,MARCHE TRADITIONNEL PLEIN VENT - Tous les mercredis d'Avril à Octobre - 8h/13h
-10219,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-10223,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-10227,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-6282,"Tous les dimanches, venez tenter votre chance lors du loto [...] Salle Polyvalente [...] à 16h30"
-10411,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-10432,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-2737,"De 9h30 à 12h30[...]Atelier Découverte [...] à partir de 8 ans[...]Sur inscription"
-10431,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-20,"Marché traditionnel, de 6h30 à 13h, place de la République : [...] > du 1er avril au 30 septembre : tous les jours[...] > d'octobre à mars : tous les jeudis et dimanches"
-4795,"Marché du Terroir et de l'artisanat sur la promenade de 18h30 à 23h."
-4265,"Le samedi 17 mai 2025, la fête de la transhumance [...] Dès 9h00, [...] à 10h00 [...] À 11h30 [...] À 12h00 [...] à 14h30 [...] à 15h00 et 16h00."
-5207,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-1096,"[...] Les horaires sont les suivants : Samedis :  11 à 12h, puis de 15h à 16h Dimanches :  de 11h à 12h"
-11725,"Visite guidée ""L'Esprit Palavasien"" [...] Novembre : 01/11 de 14h30 à 16h30"
-8458,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-3111,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-8668,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-11920,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-11921,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-11925,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-11929,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-2627,"Revivez l'essor [...] visite de 2h.[...]Réservation obligatoire"
-5108,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-4006,"Concert hommage [...] Vendredi 16 mai à 20h30 [...]"
-12149,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-12157,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-12158,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-9107,"la fête de la nature ""  le samedi 24 mai 2025 [...] 9 h 30 à 10 h 30 / 11 h à 12 h [...] et le dimanche 25 mai 2025 [...] De 10 h à 17h [...]"
-9385,"Les Archives [...] Du mardi au samedi, de 10h à 18h."
-11956,"Une invitation à observer les hirondelles [...] Rendez-vous à 18h30 [...]"
-4267,"Le dimanche 25 mai 2025, la fête de la transhumance [...] À partir de 9h00 [...] à 9h30 [...] À 10h30 [...]"
-10373,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-11774,"Le Marché Gourmand [...] tous les vendredis de 18h30 à 21h."
-12154,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-7742,"Revivez l'essor [...] visite de 2h.[...]Réservation obligatoire"
-11441,"Revivez l'essor [...] visite de 2h.[...]Réservation obligatoire"
-11924,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-11930,Marché aux Halles  - Tous les jeudis de l'année de 8h - 13h
-12155,Marché aux Halles  - Tous les samedis de l'année de 8h - 13h
-11437,"Revivez l'essor [...] visite de 2h.[...]Réservation obligatoire"
-11309,"Venez découvrir [...] Visite guidée de 17h [...]"
-11776,"Le Marché Gourmand [...] tous les vendredis de 18h30 à 21h."
-11199,"Ne manquez pas l'exposition [...] Lundi au vendredi I 8h30-12h et 13h30-17h30 I Hôtel de Ville"
-10115,"18h[...]Rencontre publique [...] Nautilus"
-10097,"La ludothèque [...] ""Les Mercredis Nature"" [...] un mercredi par mois de 14h à 17h."
-6386,"Land'Art[...]Les 2, 12 et 24 juin[...]de 14h30 à 16h30[...]"
-11026,"Sortie nature [...] RDV 15h [...] inscription Office de Tourisme"
-8491,"Chasse aux œufs [...] Dimanche 20 avril : de 9h30 à 10h, de 10h30 à 11h ou de 11h30 à 12h Lundi 21 avril : [...]"
-8492,"En libre disposition de 10h à 16h : Jeux géants [...] du samedi 19 avril au lundi 21 avril !"
-10874,"Visites commentées [...] Départ [...] à 15h (16h30 en juillet et août) [...] les jours de marché [...]"
-7588,"Samedi 5 , 12 , 19 , 26 avril a 10h30."
-6273,"Tous les dimanches, venez tenter votre chance lors du loto [...] Salle Polyvalente [...] à 16h30"
-6394,"Les ateliers [...] les 15 avril, 9 mai et 11 juin de 14h à 16h"
-11730,"Visite guidée ""Les coulisses du Phare"" [...] Décembre : 30/12 de 10h30 à 11h30"
-11236,"Insolite, bucolique [...] marché bio le mardi à partir de 16h30 [...]"
-9065,"Adoptez un nouveau point de vue [...] Dernière réservation la veille à 15h."
-4999,"[...] Mercredis 26 mars, 9 et 23 avril, 21 mai, 4 et 18 juin de 14h30 à 16h [...] Exposition ""les secrets de la biodiversité""[...]Du lundi au vendredi [...] 13h30 à 17h [...] 10 h à 12h30 [...] Les dimanches : de 14h à 17h30 [...]"
-"""
-
-results = {}
-lines = [line for line in input_text.strip().split('\n') if line]
+# Loaded and compiled once; edit schedule_rules.json to add patterns
+schedule_rules = RuleSet.load()
+
+
+def first_token_after(tokens, starts, pos):
+    """Returns the first token starting at or after pos, or None. starts holds the tokens' sorted start offsets."""
+    i = bisect_left(starts, pos)
+    return tokens[i] if i < len(tokens) else None
+
+
+def tokens_within(tokens, starts, pos, max_dist):
+    """Yields the tokens starting in [pos, pos + max_dist), using the sorted start offsets."""
+    for i in range(bisect_left(starts, pos), bisect_left(starts, pos + max_dist)):
+        yield tokens[i]
+
 
 # Keywords indicating specific, non-recurring events
 event_keywords = [
@@ -145,204 +56,346 @@ event_keywords = [
     'week-end famille plus', 'loto', 'rencontre publique', 'sortie nature',
     'bouj’an courant', 'land\'art', 'châteaux de sable', 'jeux géants'
 ]
-# Regex for specific dates (DD Month, DD/MM, DD/MM/YYYY)
-specific_date_pattern = re.compile(r'\b\d{1,2}\s+(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\b|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b', re.IGNORECASE)
-
-
-for line in lines:
-    if ',' not in line: continue
-    id_str, description = line.split(',', 1)
-    try:
-        id_val = int(id_str)
-    except ValueError:
-        continue
-    description = description.strip('" ')
-    description_lower = description.lower()
-
-    # Basic check: If the description seems to be *only* about a specific event or date, skip extraction
-    is_event = any(keyword in description_lower for keyword in event_keywords)
-    has_specific_date = specific_date_pattern.search(description)
-    # If it looks like an event description AND has a specific date, be cautious
-    # We might still extract if there's a clear recurring schedule pattern ALSO mentioned
-
-    schedule = {}
-    processed_indices = set() # Keep track of processed text indices to avoid double matching
+event_classifier = EventClassifier(event_keywords)
+
+
+def assign_slot(schedule, slot_days, start, days, value):
+    """Assigns one time slot to several days and records which days the slot at offset start went to."""
+    for day_fr in days:
+        assign_time(schedule, day_map[day_fr], *value)
+    slot_days[start] = tuple(days)
+
+
+def drop_covered_tokens(tokens, rule_matches):
+    """Removes the tokens that start inside a rule match: rules take precedence over the lexer."""
+    kept = []
+    i = 0
+    for t in tokens:
+        while i < len(rule_matches) and rule_matches[i].end <= t.start:
+            i += 1
+        if i < len(rule_matches) and rule_matches[i].start <= t.start:
+            continue
+        kept.append(t)
+    return kept
+
+
+def extract_schedule(description, rules=None):
+    """
+    Extracts the weekly opening hours from one description.
+
+    Args:
+        description (str): The event description.
+        rules (RuleSet): The rule table to apply. Defaults to schedule_rules.json.
+
+    Returns:
+        Schedule: The opening hours; Schedule.to_dict() gives keys like "monday_start_hour_am"
+        mapped to "HH:MM:00" strings.
+    """
+    lap = profiler.laps("schedule")
+    if rules is None:
+        # Most descriptions name no hour or no day: skip the rule table and the lexer for them.
+        # Only for the bundled rules, whose patterns all need both.
+        if not event_classifier.has_time(description):
+            lap("prefilter")
+            return Schedule()
+        lap("prefilter")
+        rules = schedule_rules
+    rule_matches = list(rules.finditer(description))
+    lap("rules")
+    tokens = tokenize(description)
+    if rule_matches:
+        tokens = drop_covered_tokens(tokens, rule_matches)
+    time_ranges = [t for t in tokens if t.kind == TIME_RANGE]
+    single_times = [t for t in tokens if t.kind == TIME]
+    # Tokens come out of the lexer ordered by offset, so these lists are sorted for bisection
+    time_range_starts = [t.start for t in time_ranges]
+    single_time_starts = [t.start for t in single_times]
+    lap("lexer")
+
+    schedule = Schedule()
+    slot_days = {} # Start offset of every assigned time slot -> the days it went to, to avoid double matching
 
     # --- Apply specific patterns first ---
 
-    # Pattern: Tous les jours ... [TIME_RANGE] (e.g., ID 20 variation 1)
-    m_tlj = tous_les_jours_pattern.search(description)
-    if m_tlj:
-        search_area = description[m_tlj.end():]
-        m_time = time_range_pattern.search(search_area)
-        if m_time and (m_tlj.start() + m_time.start()) not in processed_indices :
-            sh, sm, eh, em = m_time.groups()
-            for day_fr in day_map.keys():
-                assign_time(schedule, day_map[day_fr], sh, sm, eh, em)
-            processed_indices.add(m_tlj.start() + m_time.start())
+    # Pattern: Tous les jours ... [TIME_RANGE]
+    every_day = next((t for t in tokens if t.kind == EVERY and len(t.value) == 7), None)
+    if every_day:
+        m_time = first_token_after(time_ranges, time_range_starts, every_day.end)
+        if m_time and m_time.start not in slot_days:
+            assign_slot(schedule, slot_days, m_time.start, every_day.value, m_time.value)
+    lap("every_day")
 
     # Pattern: Tous les [DAY]s ... [TIME_RANGE] (e.g., IDs 3109, 1419, 5017)
     # Pattern: Tous les [DAY]s ... à [TIME] (e.g., ID 6282, 6273)
-    for m_tld in tous_les_day_pattern.finditer(description):
-        day_fr = m_tld.group(2).lower()[:-1] # Extract day name
-        search_start_pos = m_tld.end()
+    for m_tld in tokens:
+        if m_tld.kind != EVERY or len(m_tld.value) != 1:
+            continue
+        search_start_pos = m_tld.end
         # Search for range first
-        m_time = time_range_pattern.search(description, search_start_pos)
-        if m_time and m_time.start() not in processed_indices:
+        m_time = first_token_after(time_ranges, time_range_starts, search_start_pos)
+        if m_time and m_time.start not in slot_days:
              # Check proximity: is the time reasonably close to the day mention?
-             if m_time.start() - search_start_pos < 50: # Heuristic distance threshold
-                 sh, sm, eh, em = m_time.groups()
-                 assign_time(schedule, day_map[day_fr], sh, sm, eh, em)
-                 processed_indices.add(m_time.start())
+             if m_time.start - search_start_pos < 50: # Heuristic distance threshold
+                 assign_slot(schedule, slot_days, m_time.start, m_tld.value, m_time.value)
                  continue # Prioritize range if found close
         # Search for single time if range not found/matched
-        m_single_time = single_time_pattern.search(description, search_start_pos)
-        if m_single_time and m_single_time.start() not in processed_indices:
-             if m_single_time.start() - search_start_pos < 50:
-                 sh, sm = m_single_time.groups()
-                 assign_time(schedule, day_map[day_fr], sh, sm, None, None)
-                 processed_indices.add(m_single_time.start())
-
-    # Pattern: Du [DAY1] au [DAY2] ... [TIME_RANGE] (e.g., ID 9385, 11199, 4999)
-    for m_dr in day_range_pattern.finditer(description):
-         start_day_fr = m_dr.group(2).lower()
-         end_day_fr = m_dr.group(3).lower()
-         search_start_pos = m_dr.end()
-
-         # Find start and end index in ordered days_fr list
-         try:
-             start_idx = days_fr.index(start_day_fr)
-             end_idx = days_fr.index(end_day_fr)
-         except ValueError:
+        m_single_time = first_token_after(single_times, single_time_starts, search_start_pos)
+        if m_single_time and m_single_time.start not in slot_days:
+             if m_single_time.start - search_start_pos < 50:
+                 assign_slot(schedule, slot_days, m_single_time.start, m_tld.value, m_single_time.value)
+    lap("every_weekday")
+
+    # Pattern: Du [DAY1] au [DAY2] ... [TIME_RANGE] (e.g., ID 9385, 4999)
+    for m_dr in tokens:
+         if m_dr.kind != DAY_RANGE:
              continue
-
-         days_in_range_fr = days_fr[start_idx:end_idx+1]
-
          # Look for time ranges after the day range mention
-         for m_time in time_range_pattern.finditer(description, search_start_pos):
-             if m_time.start() not in processed_indices:
-                  if m_time.start() - search_start_pos < 50: # Proximity check
-                     sh, sm, eh, em = m_time.groups()
-                     for day_fr in days_in_range_fr:
-                         assign_time(schedule, day_map[day_fr], sh, sm, eh, em)
-                     processed_indices.add(m_time.start())
-
-         # Handle specific case 11199 with 'et' for second time slot
-         if id_val == 11199:
-             m_et_time = re.search(r'et\s+(\d{1,2})h(\d{2})-(\d{1,2})h(\d{2})', description[search_start_pos:])
-             if m_et_time:
-                 sh, sm, eh, em = m_et_time.groups()
-                 for day_fr in days_in_range_fr:
-                     assign_time(schedule, day_map[day_fr], sh, sm, eh, em)
-                 # No simple index to add for this combined pattern, risk of double match low here.
-
-    # Pattern: [DAY] : ... [TIME_RANGE/SINGLE_TIME] (e.g., ID 2263, 1096, 4999)
+         for m_time in tokens_within(time_ranges, time_range_starts, m_dr.end, 50): # Proximity check
+             if m_time.start not in slot_days:
+                 assign_slot(schedule, slot_days, m_time.start, m_dr.value, m_time.value)
+    lap("day_range")
+
+    # Pattern: [DAY] : ... [TIME_RANGE/SINGLE_TIME] (e.g., ID 4999)
+    first_markers = {}
+    for t in tokens:
+        if t.kind == DAY and t.marker and t.value not in first_markers:
+            first_markers[t.value] = t
     for day_fr in days_fr:
-        # Look for "Day :" pattern
-        day_marker = f"{day_fr.capitalize()} :" # Be specific
-        if day_marker in description:
-             search_start_pos = description.find(day_marker) + len(day_marker)
+        if day_fr in first_markers:
+             search_start_pos = first_markers[day_fr].end + len(" :")
              # Search for ranges
-             for m_time in time_range_pattern.finditer(description, search_start_pos):
-                  if m_time.start() not in processed_indices:
-                     if m_time.start() - search_start_pos < 80: # Allow slightly larger distance
-                         sh, sm, eh, em = m_time.groups()
-                         assign_time(schedule, day_map[day_fr], sh, sm, eh, em)
-                         processed_indices.add(m_time.start())
-                         # Handle "puis de" for second range in ID 1096
-                         if id_val == 1096 and day_fr == "samedi":
-                             m_puis = re.search(r'puis\s+de\s*(\d{1,2})h(?:(\d{2}))?\s*à\s*(\d{1,2})h(?:(\d{2}))?', description[m_time.end():])
-                             if m_puis:
-                                 sh2, sm2, eh2, em2 = m_puis.groups()
-                                 assign_time(schedule, day_map[day_fr], sh2, sm2, eh2, em2)
-
-
+             for m_time in tokens_within(time_ranges, time_range_starts, search_start_pos, 80): # Allow slightly larger distance
+                  if m_time.start not in slot_days:
+                     assign_slot(schedule, slot_days, m_time.start, (day_fr,), m_time.value)
              # Search for single times
-             for m_single_time in single_time_pattern.finditer(description, search_start_pos):
-                  if m_single_time.start() not in processed_indices:
-                      if m_single_time.start() - search_start_pos < 50:
-                         sh, sm = m_single_time.groups()
-                         assign_time(schedule, day_map[day_fr], sh, sm, None, None)
-                         processed_indices.add(m_single_time.start())
+             for m_single_time in tokens_within(single_times, single_time_starts, search_start_pos, 50):
+                  if m_single_time.start not in slot_days:
+                     assign_slot(schedule, slot_days, m_single_time.start, (day_fr,), m_single_time.value)
+    lap("day_markers")
 
     # --- General Fallback: Associate time with nearest preceding day ---
-    # Find all time mentions not yet processed
-    unprocessed_times = []
-    all_times = list(time_range_pattern.finditer(description)) + list(single_time_pattern.finditer(description))
-    all_times.sort(key=lambda m: m.start())
-
-    for m_time in all_times:
-        if m_time.start() not in processed_indices:
-            is_range = m_time.re == time_range_pattern
-            sh, sm, eh, em = (None, None, None, None)
-            if is_range:
-                sh, sm, eh, em = m_time.groups()
-            else: # Single time
-                sh, sm = m_time.groups()
-
-            # Find closest preceding day mention
-            closest_day_fr = None
-            min_dist = float('inf')
-            day_mentions = list(day_pattern.finditer(description))
-            for m_day in day_mentions:
-                if m_day.end() <= m_time.start():
-                     dist = m_time.start() - m_day.end()
-                     if dist < min_dist and dist < 100: # Proximity threshold
-                          min_dist = dist
-                          closest_day_fr = m_day.group(1).lower()
-
-            # Special case: ID 20 - "tous les jeudis et dimanches"
-            if id_val == 20 and "tous les jeudis et dimanches" in description_lower:
-                 if description.find("tous les jeudis et dimanches") < m_time.start():
-                     assign_time(schedule, day_map["thursday"], sh, sm, eh, em)
-                     assign_time(schedule, day_map["sunday"], sh, sm, eh, em)
-                     processed_indices.add(m_time.start())
-                     continue # Skip default assignment
-
+    # A day range counts as a mention of its last day. Offsets are sorted, so the closest
+    # preceding mention of each time is found by bisection instead of scanning every mention.
+    day_mentions = [t for t in tokens if t.kind in (DAY, DAY_RANGE)]
+    day_mention_ends = [t.end for t in day_mentions]
+
+    def nearest_day(pos):
+        i = bisect_right(day_mention_ends, pos) - 1
+        if i >= 0 and pos - day_mention_ends[i] < 100: # Proximity threshold
+            m_day = day_mentions[i]
+            return m_day.value if m_day.kind == DAY else m_day.value[-1]
+        return None
+
+    # Unassigned times and rule-table matches are resolved together in text order, so a
+    # rule relying on the previous slot sees every slot assigned before it
+    times = [t for t in tokens if t.kind in (TIME, TIME_RANGE)]
+    for item in heapq.merge(times, rule_matches, key=attrgetter("start")):
+        if isinstance(item, RuleMatch):
+            apply_rule(item, schedule, slot_days, times, first_markers, nearest_day)
+        elif item.start not in slot_days:
+            closest_day_fr = nearest_day(item.start)
             # Assign time if a close day was found
             if closest_day_fr:
-                assign_time(schedule, day_map[closest_day_fr], sh, sm, eh, em)
-                processed_indices.add(m_time.start())
-
-    # Handle remaining specific cases or overrides
-    if id_val == 2263: # Overwrite based on structure if general logic failed
-         t_match = re.search(r'de\s*(\d{1,2})h(?:(\d{2}))?\s*à\s*(\d{1,2})h(?:(\d{2}))?', description, re.IGNORECASE)
-         if t_match:
-            sh, sm, eh, em = t_match.groups()
-            if "Mercredi :" in description and not schedule.get("wednesday_start_hour_am"): assign_time(schedule, day_map["mercredi"], sh, sm, eh, em)
-            if "Vendredi :" in description and not schedule.get("friday_start_hour_am"): assign_time(schedule, day_map["vendredi"], sh, sm, eh, em)
-            if "Dimanche :" in description and not schedule.get("sunday_start_hour_am"): assign_time(schedule, day_map["dimanche"], sh, sm, eh, em)
-
-    if id_val == 11236: # "marché bio le mardi à partir de 16h30"
-         m = re.search(r'le\s+mardi\s+à\s+partir\s+de\s*(\d{1,2})h(?:(\d{2}))?', description, re.IGNORECASE)
-         if m and not schedule.get("tuesday_start_hour_pm"):
-              assign_time(schedule, day_map["tuesday"], m.group(1), m.group(2), None, None)
-
-    if id_val == 10097: # "un mercredi par mois de 14h à 17h"
-        m = re.search(r'un\s+mercredi.*?de\s*(\d{1,2})h(?:(\d{2}))?\s*à\s*(\d{1,2})h(?:(\d{2}))?', description, re.IGNORECASE)
-        if m and not schedule.get("wednesday_start_hour_pm"):
-            assign_time(schedule, day_map["mercredi"], m.group(1), m.group(2), m.group(3), m.group(4))
-
-    if id_val == 7588: # "Samedi ... a 10h30"
-        m = re.search(r'\b(Samedi)\b.*?a\s*(\d{1,2})h(?:(\d{2}))?', description, re.IGNORECASE)
-        if m and not schedule.get("saturday_start_hour_am"):
-             assign_time(schedule, day_map[m.group(1).lower()], m.group(2), m.group(3), None, None)
-
-    # Filter out results for IDs that are clearly specific events or have no time info
-    ids_to_skip = [9891, 10246, 5369, 2737, 4795, 4265, 11725, 2627, 4006, 9107, 11956, 4267, 7742, 11441, 11437, 11309, 10115, 6386, 11026, 8491, 8492, 10874, 6394, 11730, 9065]
-    if id_val in ids_to_skip:
-         schedule = {} # Force empty
-
-    # Add non-empty schedule to results
-    if schedule:
-        results[id_val] = schedule
-
-
-# Format output as a JSON string representing the Python dictionary
-# Use json.dumps for proper formatting and escaping
-output_json = json.dumps(results, indent=2, ensure_ascii=False)
-
-# Convert JSON string back to resemble Python dict literal as requested
-output_str = output_json.replace("null", "None").replace("true", "True").replace("false", "False")
-
-print(output_str)
\ No newline at end of file
+                assign_slot(schedule, slot_days, item.start, (closest_day_fr,), item.value)
+    lap("nearest_day_and_rules")
+
+    return schedule
+
+
+def apply_rule(match, schedule, slot_days, times, first_markers, nearest_day):
+    """
+    Assigns the slot described by one rule-table match.
+
+    Args:
+        match (RuleMatch): The match to apply.
+        schedule (Schedule): The schedule being built.
+        slot_days (dict): Start offset of every assigned slot -> its days.
+        times (list): The description's TIME and TIME_RANGE tokens, in text order.
+        first_markers (dict): French day name -> its first "Jour :" marker token.
+        nearest_day (function): Offset -> the closest preceding day mention, or None.
+    """
+    rule = match.rule
+    start, value = match.start, match.value
+    if rule.time == "next":
+        m_time = next((t for t in times if t.start >= match.end and t.start not in slot_days), None)
+        if m_time is None or m_time.start - match.end >= rule.max_distance:
+            return
+        start, value = m_time.start, m_time.value
+
+    if rule.days == "match":
+        days = match.days
+    elif rule.days == "previous_slot":
+        previous = [s for s in slot_days if s < match.start]
+        days = slot_days[max(previous)] if previous else ()
+        if not days:
+            day = nearest_day(match.start)
+            days = (day,) if day else ()
+    elif rule.days == "nearest_day":
+        day = nearest_day(match.start)
+        days = (day,) if day else ()
+    else: # unscheduled_markers
+        scheduled = {day for slot in slot_days.values() for day in slot}
+        days = tuple(day for day in first_markers if day not in scheduled)
+
+    if days:
+        rule.hits += 1
+        assign_slot(schedule, slot_days, start, days, value)
+
+
+# Rows whose description is clearly a one-off event or has no recurring time info
+ids_to_skip = {9891, 10246, 5369, 2737, 4795, 4265, 11725, 2627, 4006, 9107, 11956, 4267, 7742, 11441, 11437, 11309, 10115, 6386, 11026, 8491, 8492, 10874, 6394, 11730, 9065}
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Supabase_Snippet_Event_Management_Table.csv")
+
+
+def iter_csv_rows(csv_file, id_column="id", description_column="description"):
+    """
+    Streams (id, description) pairs from a CSV export, one row at a time.
+
+    Args:
+        csv_file (file): An open text file. Quoted multi-line fields are handled by the csv module.
+        id_column (str): The header of the id column.
+        description_column (str): The header of the description column.
+
+    Yields:
+        tuple: (int id, str description). Rows with a non-numeric id are skipped.
+    """
+    for row in csv.DictReader(csv_file):
+        try:
+            id_val = int(row[id_column])
+        except (TypeError, ValueError):
+            continue
+        yield id_val, row[description_column] or ""
+
+
+def schedule_cache(store_path=None, max_entries=None):
+    """Returns a DescriptionCache of extract_schedule, persisting schedules as their 28 minute values."""
+    return DescriptionCache(extract_schedule, "output_time_json/v2", store_path=store_path, max_entries=max_entries,
+                            encode=Schedule.to_list, decode=Schedule.from_list)
+
+
+def classify_row(description):
+    """Classifies a description with event_classifier (NO_TIME when there is none), counting the classes when profiling."""
+    kind = event_classifier.classify(description) if isinstance(description, str) else NO_TIME
+    if profiler.enabled:
+        profiler.count("row_classes", kind)
+    return kind
+
+
+def keep_rows(rows, skip_one_off=False):
+    """
+    Drops the rows listed in ids_to_skip and, with skip_one_off, the rows classified as one-off events.
+
+    Yields:
+        tuple: The (id, description) pairs to extract.
+    """
+    for id_val, description in rows:
+        if id_val in ids_to_skip:
+            continue
+        # Rows are only classified when the class is used: to skip one-off events or to count classes
+        if skip_one_off or profiler.enabled:
+            if classify_row(description) == ONE_OFF and skip_one_off:
+                continue
+        yield id_val, description
+
+
+def extract_rows(rows, cache=None, skip_one_off=False):
+    """
+    Extracts the schedule of every row, running each distinct description once.
+
+    Args:
+        rows (iterable): (id, description) pairs, e.g. from iter_csv_rows.
+        cache (DescriptionCache): Optional cache to share between calls.
+        skip_one_off (bool): Leave out the descriptions classified as one-off events.
+
+    Yields:
+        tuple: (id, schedule) for every row with a non-empty schedule.
+    """
+    if cache is None:
+        cache = schedule_cache(max_entries=10000)
+    for id_val, description in keep_rows(rows, skip_one_off):
+        schedule = cache.get(description)
+        if schedule:
+            yield id_val, schedule
+
+
+def write_profile(path, cache):
+    if not profiler.enabled:
+        return
+    # Every extraction of this script runs in this process, so rule_hits covers all of them:
+    # one per cache miss, the descriptions served from the cache aren't matched again
+    profiler.set_counts("rule_hits", schedule_rules.hit_counts())
+    profiler.set_counts("cache_lookups", {"hit": cache.hits, "miss": cache.misses})
+    profiler.write(path)
+
+
+def run_incremental(args, cache):
+    rows = profiler.timed_iter("read_input", iter_export_rows(args.input, args.id_column, args.description_column))
+    rows = keep_rows(rows, args.skip_one_off)
+    manifest = Manifest(args.incremental, cache.namespace, encode=Schedule.to_list, decode=Schedule.from_list)
+    try:
+        with profiler.stage("sync"):
+            changes = sync(rows, manifest, extract_schedule, cache)
+        with profiler.stage("write"):
+            patch_ndjson(args.output, changes, manifest,
+                         lambda id_val, schedule: {"id": id_val, "schedule": schedule.to_dict()} if schedule else None)
+        manifest.commit()
+    finally:
+        manifest.close()
+    stats = changes.stats()
+    print(f"{stats['inserted']} inserted, {stats['changed']} changed, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged ({cache.misses} extractions)", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract weekly opening hours from an event CSV export as NDJSON.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV, help="CSV file with id and description columns")
+    parser.add_argument("-o", "--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--description-column", default="description")
+    parser.add_argument("--cache", help="SQLite file persisting extractions across runs")
+    parser.add_argument("--cache-entries", type=int, default=10000, help="Distinct descriptions kept in memory")
+    parser.add_argument("--incremental", metavar="MANIFEST",
+                        help="SQLite manifest of the last run: only extract new and changed rows and patch --output. "
+                             "The input can then also be a SQLite database with an events table.")
+    parser.add_argument("--skip-one-off", action="store_true",
+                        help="Leave out descriptions of one-off events: an event keyword or a date, and no recurrence "
+                             "(\"tous les\", \"chaque\", \"les lundis\", \"du lundi au vendredi\")")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiler.enable(args.profile_slowest)
+
+    # Some descriptions are far longer than the csv module's default 128KB field limit
+    csv.field_size_limit(2**31 - 1)
+    cache = schedule_cache(store_path=args.cache, max_entries=args.cache_entries)
+    # Times every extraction (cache misses) and keeps the slowest descriptions; a no-op without --profile
+    cache.extract_fn = profiler.profiled(cache.extract_fn)
+    if args.incremental:
+        if not args.output:
+            parser.error("--incremental needs --output, the file it patches")
+        try:
+            run_incremental(args, cache)
+        finally:
+            cache.close()
+        write_profile(args.profile, cache)
+        return
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    count = 0
+    try:
+        with open(args.input, newline="", encoding="utf-8") as csv_file:
+            rows = profiler.timed_iter("read_input", iter_csv_rows(csv_file, args.id_column, args.description_column))
+            for id_val, schedule in extract_rows(rows, cache, args.skip_one_off):
+                with profiler.stage("write"):
+                    output.write(json.dumps({"id": id_val, "schedule": schedule.to_dict()}, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        cache.close()
+        if output is not sys.stdout:
+            output.close()
+    print(f"Extracted {count} schedules ({cache.hits} cache hits, {cache.misses} extractions)", file=sys.stderr)
+    write_profile(args.profile, cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _extract_chunk(extract_fn, chunk):
+    # Runs in a worker process; extract_fn must be a module-level function so it can be pickled
+    started = time.perf_counter()
+    results = [extract_fn(text) for text in chunk]
+    return os.getpid(), time.perf_counter() - started, results
+
+
+def chunked(items, chunk_size):
+    for i in range(0, len(items), chunk_size):
+        yield items[i:i + chunk_size]
+
+
+def extract_parallel(texts, extract_fn, workers=None, chunk_size=500):
+    """
+    Runs an extractor over texts in a process pool and merges the results in the original order.
+
+    Args:
+        texts (list): The descriptions to extract.
+        extract_fn (function): A picklable (module-level) function taking one text.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int): Number of texts sent to a worker at a time.
+
+    Returns:
+        tuple: (results in the same order as texts, per-worker timing dict keyed by pid
+        with "chunks", "rows" and "seconds").
+    """
+    texts = list(texts)
+    results = []
+    timings = {}
+    if not texts:
+        return results, timings
+    workers = workers or os.cpu_count() or 1
+    chunks = list(chunked(texts, chunk_size))
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        # map() yields in submission order, so results line up with texts
+        for pid, seconds, chunk_results in pool.map(_extract_chunk, [extract_fn] * len(chunks), chunks):
+            timing = timings.setdefault(pid, {"chunks": 0, "rows": 0, "seconds": 0.0})
+            timing["chunks"] += 1
+            timing["rows"] += len(chunk_results)
+            timing["seconds"] += seconds
+            results.extend(chunk_results)
+    return results, timings
+
+
+def format_timings(timings):
+    lines = []
+    for worker, (pid, timing) in enumerate(sorted(timings.items()), start=1):
+        rate = timing["rows"] / timing["seconds"] if timing["seconds"] else float("inf")
+        lines.append(f"worker {worker} (pid {pid}): {timing['chunks']} chunks, {timing['rows']} rows, "
+                     f"{timing['seconds']:.2f}s ({rate:.0f} rows/s)")
+    return "\n".join(lines)
@@ -0,0 +1,215 @@
+"""
+Opt-in instrumentation for the extraction scripts: time per pipeline stage, named counters
+(e.g. rule hits) and the slowest descriptions, exported as JSON or Prometheus text.
+
+The module-level profiler is disabled until a script's --profile flag enables it; while
+disabled, stage() returns a shared no-op context manager so instrumented code costs next to nothing.
+"""
+import heapq
+import itertools
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+_disabled_stage = nullcontext()
+
+
+def _no_lap(name):
+    pass
+
+
+class _Stage(object):
+    __slots__ = ("totals", "started")
+
+    def __init__(self, totals):
+        self.totals = totals
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.totals[0] += 1
+        self.totals[1] += time.perf_counter() - self.started
+
+
+class Profiler(object):
+    '''
+    Accumulates calls and seconds per stage name, counters, and the N slowest extractions.
+    '''
+
+    def __init__(self, enabled=False, slowest=10):
+        self.enabled = enabled
+        self.slowest_count = slowest
+        self.reset()
+
+    def reset(self):
+        # stage name -> [calls, seconds]
+        self.stages = {}
+        # metric -> {name: value}
+        self.counters = {}
+        self.slowest = []
+        self._sequence = itertools.count()
+        self.started = time.perf_counter()
+
+    def enable(self, slowest=None):
+        if slowest is not None:
+            self.slowest_count = slowest
+        self.enabled = True
+        self.reset()
+
+    def stage(self, name):
+        """
+        Times a block of code: with profiler.stage("lexer"): ...
+
+        Args:
+            name (str): The stage the time is added to.
+        """
+        if not self.enabled:
+            return _disabled_stage
+        return _Stage(self.stages.setdefault(name, [0, 0.0]))
+
+    def laps(self, prefix):
+        """
+        Times consecutive steps without wrapping each one in a with block.
+
+            lap = profiler.laps("schedule")
+            ...                 # tokenize
+            lap("lexer")        # adds the time since laps() to "schedule.lexer"
+            ...
+            lap("fallback")     # adds the time since the previous lap to "schedule.fallback"
+
+        Returns:
+            function: Takes the name of the step that just ended.
+        """
+        if not self.enabled:
+            return _no_lap
+        clock = time.perf_counter
+        last = [clock()]
+
+        def lap(name):
+            now = clock()
+            self.add(f"{prefix}.{name}", now - last[0])
+            last[0] = now
+        return lap
+
+    def add(self, name, seconds, calls=1):
+        totals = self.stages.setdefault(name, [0, 0.0])
+        totals[0] += calls
+        totals[1] += seconds
+
+    def count(self, metric, name, value=1):
+        counts = self.counters.setdefault(metric, {})
+        counts[name] = counts.get(name, 0) + value
+
+    def set_counts(self, metric, counts):
+        self.counters[metric] = dict(counts)
+
+    def record(self, seconds, description):
+        """Keeps a description if it is one of the N slowest seen so far."""
+        entry = (seconds, next(self._sequence), description)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def profiled(self, extract_fn, name="extract"):
+        """
+        Wraps an extractor taking one description so each call is timed as a stage and ranked
+        among the slowest. Returns extract_fn itself when the profiler is disabled.
+        """
+        if not self.enabled:
+            return extract_fn
+        clock = time.perf_counter
+
+        def wrapper(description, *args, **kwargs):
+            started = clock()
+            result = extract_fn(description, *args, **kwargs)
+            seconds = clock() - started
+            self.add(name, seconds)
+            self.record(seconds, description)
+            return result
+        return wrapper
+
+    def timed_iter(self, name, iterable):
+        """Yields from iterable, adding the time spent producing each item to a stage (e.g. CSV parsing)."""
+        if not self.enabled:
+            yield from iterable
+            return
+        totals = self.stages.setdefault(name, [0, 0.0])
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            started = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                totals[1] += clock() - started
+                return
+            totals[0] += 1
+            totals[1] += clock() - started
+            yield item
+
+    def report(self, preview_chars=120):
+        """
+        Returns:
+            dict: "wall_seconds", "stages" (name -> calls, seconds, mean_ms, sorted by time spent),
+            "counters" and "slowest" (seconds, chars and the start of the description, slowest first).
+        """
+        stages = sorted(self.stages.items(), key=lambda item: -item[1][1])
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "stages": {name: {"calls": calls, "seconds": seconds, "mean_ms": seconds / calls * 1000 if calls else 0.0}
+                       for name, (calls, seconds) in stages},
+            "counters": self.counters,
+            "slowest": [{"seconds": seconds, "chars": len(description),
+                         "description": " ".join(description.split())[:preview_chars]}
+                        for seconds, _, description in sorted(self.slowest, reverse=True)],
+        }
+
+    def to_json(self):
+        return json.dumps(self.report(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="timeextractor"):
+        """Renders the report in the Prometheus text exposition format."""
+        report = self.report()
+        lines = [f"# TYPE {prefix}_wall_seconds gauge", f"{prefix}_wall_seconds {report['wall_seconds']:.6f}",
+                 f"# TYPE {prefix}_stage_seconds_total counter"]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{_label(name)}"}} {stage["seconds"]:.6f}'
+                  for name, stage in report["stages"].items()]
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        lines += [f'{prefix}_stage_calls_total{{stage="{_label(name)}"}} {stage["calls"]}'
+                  for name, stage in report["stages"].items()]
+        for metric, counts in report["counters"].items():
+            lines.append(f"# TYPE {prefix}_{metric}_total counter")
+            lines += [f'{prefix}_{metric}_total{{name="{_label(name)}"}} {value}' for name, value in counts.items()]
+        lines.append(f"# TYPE {prefix}_slowest_description_seconds gauge")
+        lines += [f'{prefix}_slowest_description_seconds{{rank="{rank}",chars="{row["chars"]}"}} {row["seconds"]:.6f}'
+                  for rank, row in enumerate(report["slowest"], start=1)]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the report: Prometheus text for a .prom or .txt path, JSON otherwise, stderr for "-".
+        """
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        if path == "-":
+            print(text, file=sys.stderr)
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", nargs="?", const="-", metavar="REPORT",
+                        help="Time every stage and write a report: .prom/.txt for Prometheus text, "
+                             "any other path for JSON, stderr when no path is given")
+    parser.add_argument("--profile-slowest", type=int, default=10, metavar="N",
+                        help="Slowest descriptions kept in the profile report")
+
+
+profiler = Profiler()
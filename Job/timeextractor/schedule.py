@@ -0,0 +1,197 @@
+from array import array
+
+days_en = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+day_index = {day: i for i, day in enumerate(days_en)}
+
+# The four times kept per day, in the order they are stored. They are the "..._start_hour_am",
+# "..._start_hour_pm", "..._end_hour_am" and "..._end_hour_pm" keys of the JSON output.
+FIELDS = ("start_hour_am", "start_hour_pm", "end_hour_am", "end_hour_pm")
+START_AM, START_PM, END_AM, END_PM = range(len(FIELDS))
+SLOTS = len(days_en) * len(FIELDS)
+UNSET = -1
+
+# JSON key of every stored time, in storage order
+json_keys = [f"{day}_{field}" for day in days_en for field in FIELDS]
+_json_key_index = {key: i for i, key in enumerate(json_keys)}
+_unset_slots = array("h", [UNSET]) * SLOTS
+
+
+def parse_clock(text):
+    """Parses "HH:MM" or "HH:MM:SS" into minutes since midnight."""
+    parts = text.split(":")
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+class Schedule(object):
+    '''
+    Weekly opening hours stored as 28 minutes-since-midnight values in one int16 array
+    (7 days x start/end x am/pm, UNSET when absent) instead of a dict of "HH:MM:00" strings.
+
+    An "am" start is before noon; an "am" end is at or before 12:00. A day is open from its am start
+    to its am end and from its pm start to its pm end. Without an am end and a pm start, it is
+    open from its am start straight through to its pm end. A start without an end counts as open
+    until midnight.
+    '''
+    __slots__ = ("minutes",)
+
+    def __init__(self, minutes=None):
+        self.minutes = array("h", _unset_slots) if minutes is None else array("h", minutes)
+
+    def set_start(self, day, hour, minute):
+        """
+        Stores a start time, in the am or pm slot of the day depending on the hour.
+
+        Args:
+            day (str): English day name.
+            hour (int): Hour, as written in the description.
+            minute (int): Minute.
+        """
+        field = START_PM if hour >= 12 else START_AM
+        self.minutes[day_index[day] * len(FIELDS) + field] = hour * 60 + minute
+
+    def set_end(self, day, hour, minute):
+        # 12:00 is still a morning end, 12:01 onwards is an afternoon end
+        field = END_PM if hour > 12 or (hour == 12 and minute > 0) else END_AM
+        self.minutes[day_index[day] * len(FIELDS) + field] = hour * 60 + minute
+
+    def day_times(self, day):
+        base = day_index[day] * len(FIELDS)
+        return tuple(self.minutes[base:base + len(FIELDS)])
+
+    def intervals(self, day):
+        """
+        Returns the opening intervals of one day.
+
+        Args:
+            day (str): English day name.
+
+        Returns:
+            list: (start, end) pairs in minutes since midnight.
+        """
+        start_am, start_pm, end_am, end_pm = self.day_times(day)
+        intervals = []
+        if start_am != UNSET:
+            if end_am != UNSET:
+                intervals.append((start_am, end_am))
+            elif start_pm == UNSET:
+                intervals.append((start_am, end_pm if end_pm != UNSET else 24 * 60))
+        if start_pm != UNSET:
+            intervals.append((start_pm, end_pm if end_pm != UNSET else 24 * 60))
+        return intervals
+
+    def is_open(self, day, clock):
+        """
+        Tells whether the schedule is open at a given time.
+
+        Args:
+            day (str): English day name, e.g. "thursday".
+            clock (str or int): "HH:MM" or minutes since midnight.
+
+        Returns:
+            bool: True when clock falls within one of the day's intervals (bounds included).
+        """
+        minutes = parse_clock(clock) if isinstance(clock, str) else clock
+        return any(start <= minutes <= end for start, end in self.intervals(day))
+
+    def to_dict(self):
+        """
+        Serializes to the JSON shape written by output_time_json.
+
+        Returns:
+            dict: The set times only, e.g. {"monday_start_hour_am": "08:00:00", ...}.
+        """
+        return {json_keys[i]: format_minutes(m) for i, m in enumerate(self.minutes) if m != UNSET}
+
+    @classmethod
+    def from_dict(cls, schedule):
+        schedule_obj = cls()
+        for key, value in schedule.items():
+            schedule_obj.minutes[_json_key_index[key]] = parse_clock(value)
+        return schedule_obj
+
+    def to_list(self):
+        # Compact JSON form used by the description cache
+        return self.minutes.tolist()
+
+    @classmethod
+    def from_list(cls, minutes):
+        return cls(minutes)
+
+    def __bool__(self):
+        return self.minutes != _unset_slots
+
+    def __eq__(self, other):
+        return isinstance(other, Schedule) and self.minutes == other.minutes
+
+    def __repr__(self):
+        return f"Schedule({self.to_dict()!r})"
+
+
+class ScheduleTable(object):
+    '''
+    Many schedules as one NumPy int16 matrix (one row per event, SLOTS columns in json_keys order),
+    for vectorized "open at" queries and Arrow/Parquet export.
+    '''
+
+    def __init__(self, ids, minutes):
+        self.ids = ids
+        self.minutes = minutes
+
+    @classmethod
+    def from_schedules(cls, items):
+        """
+        Args:
+            items (iterable): (id, Schedule) pairs.
+        """
+        import numpy as np
+        ids = []
+        rows = array("h")
+        for id_val, schedule in items:
+            ids.append(id_val)
+            rows.extend(schedule.minutes)
+        return cls(np.asarray(ids), np.frombuffer(rows, dtype=np.int16).reshape(len(ids), SLOTS).copy())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def schedule(self, row):
+        return Schedule(self.minutes[row].tolist())
+
+    def open_at(self, day, clock):
+        """
+        Vectorized Schedule.is_open over every row.
+
+        Returns:
+            numpy.ndarray: The ids of the events open on day at clock.
+        """
+        import numpy as np
+        minutes = parse_clock(clock) if isinstance(clock, str) else clock
+        base = day_index[day] * len(FIELDS)
+        start_am, start_pm, end_am, end_pm = (self.minutes[:, base + field] for field in range(len(FIELDS)))
+        midnight = np.int16(24 * 60)
+        has = lambda column: column != UNSET
+        pm_end = np.where(has(end_pm), end_pm, midnight)
+        morning_end = np.where(has(end_am), end_am, pm_end)
+        morning = has(start_am) & (has(end_am) | ~has(start_pm)) & (start_am <= minutes) & (minutes <= morning_end)
+        afternoon = has(start_pm) & (start_pm <= minutes) & (minutes <= pm_end)
+        return self.ids[morning | afternoon]
+
+    def to_arrow(self):
+        """
+        Converts to a pyarrow Table: an id column and one nullable int16 column of minutes since
+        midnight per JSON key.
+        """
+        import pyarrow as pa
+        columns = {"id": pa.array(self.ids)}
+        for i, key in enumerate(json_keys):
+            column = self.minutes[:, i]
+            columns[key] = pa.array(column, mask=column == UNSET, type=pa.int16())
+        return pa.table(columns)
+
+    def to_parquet(self, path):
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path)
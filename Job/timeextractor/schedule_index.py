@@ -0,0 +1,312 @@
+"""
+In-memory index answering "which events are open on <day> between <start> and <end>".
+
+Events are bucketed by weekday and time slot. A query unions the buckets its range touches and
+only checks the exact intervals of the events starting or ending in its first and last slot. The index is built from output_time_json schedules
+or extract_hours_days times, updated with insert/remove, and saved to a compact binary file so
+a server can load it at startup instead of extracting again.
+
+    python schedule_index.py build schedules.ndjson -o schedules.idx
+    python schedule_index.py query schedules.idx samedi 9h 11h
+"""
+import argparse
+import json
+import re
+import struct
+import sys
+import time
+from array import array
+
+from schedule import Schedule, days_en
+
+days_fr = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+day_numbers = {**{day: i for i, day in enumerate(days_en)}, **{day: i for i, day in enumerate(days_fr)}}
+MINUTES_PER_DAY = 24 * 60
+
+MAGIC = b"SIDX"
+VERSION = 1
+# magic, version, slot minutes, events, intervals
+_header = struct.Struct("<4sHHII")
+
+# "9h", "9h30", "09:30", "9"
+_time_pattern = re.compile(r"(\d{1,2})(?:\s*[h:]\s*(\d{2})?)?", re.IGNORECASE)
+
+
+def day_number(day):
+    """Returns 0 (Monday) to 6 for an English or French day name, or a day number."""
+    if isinstance(day, int):
+        return day
+    try:
+        return day_numbers[day.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown day {day!r}") from None
+
+
+def parse_time(value):
+    """
+    Args:
+        value (str or int): "9h", "9h30", "09:30" or minutes since midnight.
+
+    Returns:
+        int: Minutes since midnight.
+    """
+    if isinstance(value, int):
+        return value
+    m = _time_pattern.fullmatch(value.strip())
+    if m is None:
+        raise ValueError(f"Unrecognized time {value!r}")
+    return int(m.group(1)) * 60 + int(m.group(2) or 0)
+
+
+def schedule_intervals(schedule):
+    """
+    Args:
+        schedule (Schedule or dict): An output_time_json schedule, or its JSON form.
+
+    Returns:
+        tuple: Seven tuples (Monday first) of (start, end) minutes, see Schedule.intervals.
+    """
+    if isinstance(schedule, dict):
+        schedule = Schedule.from_dict(schedule)
+    return tuple(tuple(schedule.intervals(day)) for day in days_en)
+
+
+def daily_times_intervals(times):
+    """
+    Converts extract_hours_days times to intervals. A single time ("10h") is an instant
+    (start == end) and a range ending past midnight ("22h-2h") is cut at midnight.
+
+    Args:
+        times (tuple or dict): Seven tuples of times such as "10h-12h" (lundi first), or the
+            extract_times_by_day dict.
+
+    Returns:
+        tuple: Seven tuples of (start, end) minutes.
+    """
+    if isinstance(times, dict):
+        times = [times.get(day, ()) for day in days_fr]
+    intervals = []
+    for day_times in times:
+        day_intervals = []
+        for text in day_times:
+            start, _, end = text.partition("-")
+            start = parse_time(start)
+            end = parse_time(end) if end else start
+            day_intervals.append((start, end if end >= start else MINUTES_PER_DAY))
+        intervals.append(tuple(day_intervals))
+    return tuple(intervals)
+
+
+class ScheduleIndex(object):
+    '''
+    Event ids bucketed by weekday and slot_minutes-long time slot, with each event's exact
+    intervals kept alongside.
+
+    Each slot has two sets: the events open for the whole slot ("covering") and the events
+    with an interval starting or ending inside it ("partial"). Only the partial events of the
+    first and last slot of a query need their intervals checked.
+    '''
+
+    def __init__(self, slot_minutes=30):
+        if not 0 < slot_minutes <= MINUTES_PER_DAY:
+            raise ValueError(f"slot_minutes should be between 1 and {MINUTES_PER_DAY}. Got {slot_minutes} instead")
+        self.slot_minutes = slot_minutes
+        # One more slot for intervals ending at midnight (24:00)
+        slots = MINUTES_PER_DAY // slot_minutes + 1
+        self.covering = [[set() for _ in range(slots)] for _ in days_en]
+        self.partial = [[set() for _ in range(slots)] for _ in days_en]
+        # event id -> seven tuples of (start, end) minutes
+        self.intervals = {}
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __contains__(self, event_id):
+        return event_id in self.intervals
+
+    def _slots(self, start, end):
+        return range(min(start, MINUTES_PER_DAY) // self.slot_minutes, min(end, MINUTES_PER_DAY) // self.slot_minutes + 1)
+
+    def _buckets(self, day, start, end):
+        # Yields the set of every slot [start, end] touches: covering if the interval spans the whole slot
+        slot_minutes = self.slot_minutes
+        for slot in self._slots(start, end):
+            slot_start = slot * slot_minutes
+            slot_end = min(slot_start + slot_minutes - 1, MINUTES_PER_DAY)
+            covered = start <= slot_start and end >= slot_end
+            yield (self.covering if covered else self.partial)[day][slot]
+
+    def insert(self, event_id, day_intervals):
+        """
+        Adds an event, replacing it if already indexed.
+
+        Args:
+            event_id (int): The event id.
+            day_intervals (tuple): Seven sequences (Monday first) of (start, end) minutes,
+                e.g. from schedule_intervals or daily_times_intervals.
+        """
+        if event_id in self.intervals:
+            self.remove(event_id)
+        day_intervals = tuple(tuple((int(start), int(end)) for start, end in day) for day in day_intervals)
+        if len(day_intervals) != len(days_en):
+            raise ValueError(f"Expected intervals for {len(days_en)} days. Got {len(day_intervals)} instead")
+        self.intervals[event_id] = day_intervals
+        for day, intervals in enumerate(day_intervals):
+            for start, end in intervals:
+                for bucket in self._buckets(day, start, end):
+                    bucket.add(event_id)
+
+    def insert_schedule(self, event_id, schedule):
+        self.insert(event_id, schedule_intervals(schedule))
+
+    def remove(self, event_id):
+        """
+        Removes an event.
+
+        Returns:
+            bool: False when the event was not indexed.
+        """
+        day_intervals = self.intervals.pop(event_id, None)
+        if day_intervals is None:
+            return False
+        for day, intervals in enumerate(day_intervals):
+            for start, end in intervals:
+                for bucket in self._buckets(day, start, end):
+                    bucket.discard(event_id)
+        return True
+
+    def open_between(self, day, start, end):
+        """
+        Finds the events open at some point of a time range.
+
+        Args:
+            day (str or int): English or French day name, or 0 (Monday) to 6.
+            start (str or int): "9h", "09:30" or minutes since midnight.
+            end (str or int): Same, not before start.
+
+        Returns:
+            list: Sorted ids of the events with an interval overlapping [start, end] (bounds included).
+        """
+        day = day_number(day)
+        start, end = parse_time(start), parse_time(end)
+        if end < start:
+            raise ValueError(f"The end of the range ({end} min) is before its start ({start} min)")
+        covering, partial = self.covering[day], self.partial[day]
+        slots = self._slots(start, end)
+        first, last = slots[0], slots[-1]
+        found = set()
+        for slot in slots:
+            found |= covering[slot]
+            # A slot strictly between the first and the last lies inside [start, end]
+            if first < slot < last:
+                found |= partial[slot]
+        intervals = self.intervals
+        for slot in {first, last}:
+            for event_id in partial[slot] - found:
+                if any(a <= end and start <= b for a, b in intervals[event_id][day]):
+                    found.add(event_id)
+        return sorted(found)
+
+    def open_at(self, day, at):
+        """Finds the events open at one time, same semantics as Schedule.is_open."""
+        return self.open_between(day, at, at)
+
+    def save(self, path):
+        """
+        Writes the index as a header then three little-endian arrays: the int64 event ids, the
+        number of intervals of each event and day (uint8), and every interval as two int16.
+        The buckets are rebuilt on load.
+        """
+        ids = array("q")
+        counts = array("B")
+        flat = array("h")
+        for event_id, day_intervals in self.intervals.items():
+            if not isinstance(event_id, int):
+                raise TypeError(f"Only integer event ids can be saved. Got {event_id!r}")
+            ids.append(event_id)
+            for intervals in day_intervals:
+                counts.append(len(intervals))
+                for start, end in intervals:
+                    flat.append(start)
+                    flat.append(end)
+        if sys.byteorder != "little":
+            ids.byteswap()
+            flat.byteswap()
+        with open(path, "wb") as f:
+            f.write(_header.pack(MAGIC, VERSION, self.slot_minutes, len(ids), len(flat) // 2))
+            ids.tofile(f)
+            counts.tofile(f)
+            flat.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            magic, version, slot_minutes, event_count, interval_count = _header.unpack(f.read(_header.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} schedule index")
+            ids = array("q")
+            ids.fromfile(f, event_count)
+            counts = array("B")
+            counts.fromfile(f, event_count * len(days_en))
+            flat = array("h")
+            flat.fromfile(f, interval_count * 2)
+        if sys.byteorder != "little":
+            ids.byteswap()
+            flat.byteswap()
+        index = cls(slot_minutes)
+        position = 0
+        for i, event_id in enumerate(ids):
+            day_intervals = []
+            for count in counts[i * len(days_en):(i + 1) * len(days_en)]:
+                day_intervals.append(tuple(zip(flat[position:position + 2 * count:2],
+                                               flat[position + 1:position + 2 * count:2])))
+                position += 2 * count
+            index.insert(event_id, day_intervals)
+        return index
+
+
+def build_from_ndjson(path, slot_minutes=30):
+    """
+    Indexes an output_time_json NDJSON file ({"id": ..., "schedule": {...}} per line).
+    """
+    index = ScheduleIndex(slot_minutes)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                index.insert_schedule(record["id"], record["schedule"])
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query a weekday/time-slot index of extracted schedules.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index an output_time_json NDJSON file")
+    build.add_argument("input")
+    build.add_argument("-o", "--output", default="schedules.idx")
+    build.add_argument("--slot-minutes", type=int, default=30)
+    query = commands.add_parser("query", help="List the events open on a day between two times")
+    query.add_argument("index")
+    query.add_argument("day", help="English or French day name")
+    query.add_argument("start", help='e.g. "9h" or "09:30"')
+    query.add_argument("end", nargs="?", help="Defaults to start: open at that time")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index = build_from_ndjson(args.input, args.slot_minutes)
+        index.save(args.output)
+        print(f"Indexed {len(index)} events into {args.output}", file=sys.stderr)
+        return
+
+    started = time.perf_counter()
+    index = ScheduleIndex.load(args.index)
+    loaded = time.perf_counter()
+    event_ids = index.open_between(args.day, args.start, args.end or args.start)
+    queried = time.perf_counter()
+    print("\n".join(str(event_id) for event_id in event_ids))
+    print(f"{len(event_ids)} of {len(index)} events open (load {(loaded - started) * 1000:.1f} ms, "
+          f"query {(queried - loaded) * 1000:.3f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
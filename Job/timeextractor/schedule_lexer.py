@@ -0,0 +1,106 @@
+import re
+from collections import namedtuple
+
+# Token kinds
+DAY = "DAY"                 # lundi ... dimanche (value: French day name)
+DAY_RANGE = "DAY_RANGE"     # (du) mardi au samedi (value: tuple of French day names, in order)
+TIME = "TIME"               # à 17h, Dès 9h00 (value: (hour, minute, None, None))
+TIME_RANGE = "TIME_RANGE"   # de 8h à 13h, 8h/13h (value: (start_hour, start_minute, end_hour, end_minute))
+EVERY = "EVERY"             # tous les jours / tous les jeudis (value: tuple of French day names)
+SEPARATOR = "SEPARATOR"     # ; | and line breaks (value: the character)
+
+# marker is set on capitalized DAY tokens directly followed by " :" ("Samedi : ...")
+Token = namedtuple("Token", ["kind", "start", "end", "value", "marker"], defaults=[False])
+
+days_fr = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+months_fr = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+             "septembre", "octobre", "novembre", "décembre"]
+
+_days = "|".join(days_fr)
+
+
+def _token_pattern(space):
+    # space: the whitespace allowed inside a token
+    time_separator = rf"(?:-|à|/|–|et|puis{space}+de)"
+    # One alternation covering every token kind, scanned with a single finditer pass.
+    # Alternatives are tried in order at each position, so time ranges win over single times.
+    # A range start needs an "h" before its minutes and may not follow a digit, so years
+    # such as "2025 à 21h" are not read as 20:25-21:00.
+    return re.compile(rf"""
+        (?P<time_range>
+            (?:de{space}+|dès{space}*)?(?<!\d)(?P<range_start_hour>\d{{1,2}})(?:{space}*h{space}*(?:(?P<range_start_minute>\d{{2}}))?)?
+            {space}*{time_separator}{space}*
+            (?P<range_end_hour>\d{{1,2}}){space}*h{space}*(?:(?P<range_end_minute>\d{{2}}))?
+        )
+        |(?P<time>
+            (?:à|:|Dès){space}*(?P<time_hour>\d{{1,2}}){space}*h{space}*(?:(?P<time_minute>\d{{2}}))?(?!\d)
+            (?!{space}*(?:-|à|/|–|et){space}*\d{{1,2}}{space}*h)
+        )
+        |(?P<every>\btous{space}+les{space}+(?P<every_what>jours|(?:{_days})s)\b)
+        |(?P<day_range>\b(?:du{space}+)?(?P<range_from>{_days}){space}+au{space}+(?P<range_to>{_days})\b)
+        |(?P<day>\b(?:{_days})\b)
+        |(?P<separator>[;|\n])
+    """, re.IGNORECASE | re.VERBOSE)
+
+
+# extract_schedule reads descriptions with their whitespace collapsed (see DescriptionCache), so
+# its tokens may span any whitespace. Text keeping its line breaks, as occurrences.py splits it
+# into lines, uses line_token_pattern: no token swallows a line break SEPARATOR there.
+token_pattern = _token_pattern(r"\s")
+line_token_pattern = _token_pattern(r"[^\S\n]")
+
+
+def days_between(start_day, end_day):
+    """
+    Lists the days of a "du X au Y" range, wrapping around the week when Y comes before X.
+
+    Args:
+        start_day (str): French name of the first day.
+        end_day (str): French name of the last day.
+
+    Returns:
+        tuple: French day names from start_day to end_day inclusive.
+    """
+    start_idx = days_fr.index(start_day)
+    end_idx = days_fr.index(end_day)
+    if end_idx < start_idx:
+        end_idx += len(days_fr)
+    return tuple(days_fr[i % len(days_fr)] for i in range(start_idx, end_idx + 1))
+
+
+def tokenize(text, keep_lines=False):
+    """
+    Splits a description into a typed token stream in one pass over the text.
+
+    Args:
+        text (str): The description.
+        keep_lines (bool): Never let a token span a line break, so every line break is a SEPARATOR.
+
+    Returns:
+        list: Token tuples ordered by start offset. Text that is not part of a token is skipped.
+    """
+    tokens = []
+    for m in (line_token_pattern if keep_lines else token_pattern).finditer(text):
+        kind = m.lastgroup
+        start, end = m.span()
+        if kind == "time_range":
+            value = (m.group("range_start_hour"), m.group("range_start_minute"),
+                     m.group("range_end_hour"), m.group("range_end_minute"))
+            tokens.append(Token(TIME_RANGE, start, end, value))
+        elif kind == "time":
+            value = (m.group("time_hour"), m.group("time_minute"), None, None)
+            tokens.append(Token(TIME, start, end, value))
+        elif kind == "day":
+            day = m.group().lower()
+            marker = m.group() == day.capitalize() and text.startswith(" :", end)
+            tokens.append(Token(DAY, start, end, day, marker))
+        elif kind == "day_range":
+            value = days_between(m.group("range_from").lower(), m.group("range_to").lower())
+            tokens.append(Token(DAY_RANGE, start, end, value))
+        elif kind == "every":
+            what = m.group("every_what").lower()
+            value = tuple(days_fr) if what == "jours" else (what[:-1],)
+            tokens.append(Token(EVERY, start, end, value))
+        else:
+            tokens.append(Token(SEPARATOR, start, end, m.group()))
+    return tokens
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+from collections import namedtuple
+
+from schedule_lexer import days_fr
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule_rules.json")
+
+# Fragments rule patterns can reference as {day}, {range} and {start}.
+# {range} and {start} define the sh/sm/eh/em groups the matcher reads the times from.
+PLACEHOLDERS = {
+    "{day}": "(?:" + "|".join(days_fr) + ")",
+    "{range}": r"(?P<sh>\d{1,2})\s*h?\s*(?:(?P<sm>\d{2}))?\s*(?:-|à|/|–)\s*(?P<eh>\d{1,2})\s*h\s*(?:(?P<em>\d{2}))?",
+    "{start}": r"(?P<sh>\d{1,2})\s*h\s*(?:(?P<sm>\d{2}))?",
+}
+
+DAYS_MODES = ("match", "previous_slot", "nearest_day", "unscheduled_markers")
+TIME_MODES = ("match", "next")
+
+_day_name_pattern = re.compile("|".join(days_fr))
+_group_name_pattern = re.compile(r"\(\?P<(\w+)>")
+
+# days: French day names from the match (empty unless the rule's days mode is "match")
+# value: (start_hour, start_minute, end_hour, end_minute), or None when the time comes from the next time token
+RuleMatch = namedtuple("RuleMatch", ["rule", "start", "end", "days", "value"])
+
+
+class Rule(object):
+    '''
+    One declarative schedule pattern.
+
+    days says where the days come from: named in the match ("match"), the days of the
+    closest preceding assigned slot, else the closest day mention ("previous_slot"), the
+    closest preceding day mention ("nearest_day") or every "Jour :" marker left without a
+    time ("unscheduled_markers").
+    time says whether the hours are in the match ("match") or in the next time token
+    within max_distance characters ("next").
+    '''
+
+    def __init__(self, name, pattern, priority=0, days="match", time="match", max_distance=50, description=""):
+        if days not in DAYS_MODES:
+            raise ValueError(f"Rule {name}: days should be one of {DAYS_MODES}. Got {days!r} instead")
+        if time not in TIME_MODES:
+            raise ValueError(f"Rule {name}: time should be one of {TIME_MODES}. Got {time!r} instead")
+        self.name = name
+        self.pattern = pattern
+        self.priority = priority
+        self.days = days
+        self.time = time
+        self.max_distance = max_distance
+        self.description = description
+        # Slots assigned by this rule in this process, see RuleSet.hit_counts
+        self.hits = 0
+
+    def expanded_pattern(self):
+        pattern = self.pattern
+        for placeholder, fragment in PLACEHOLDERS.items():
+            pattern = pattern.replace(placeholder, fragment)
+        return pattern
+
+
+class RuleSet(object):
+    '''
+    Compiles all rules into one alternation so a description is matched in a single pass.
+
+    Alternatives are ordered by descending priority, so when two rules match at the same
+    offset the higher priority one wins. Group names are prefixed per rule to stay unique.
+    '''
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: -rule.priority)
+        alternatives = []
+        # Per rule, the (prefixed, plain) names of its groups
+        self.group_names = []
+        for i, rule in enumerate(self.rules):
+            body = rule.expanded_pattern()
+            self.group_names.append([(f"r{i}_{name}", name) for name in _group_name_pattern.findall(body)])
+            body = _group_name_pattern.sub(lambda m: f"(?P<r{i}_{m.group(1)}>", body)
+            alternatives.append(f"(?P<r{i}>{body})")
+        self.pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def load(cls, path=DEFAULT_RULES_PATH):
+        with open(path, encoding="utf-8") as rules_file:
+            return cls([Rule(**spec) for spec in json.load(rules_file)])
+
+    def finditer(self, text):
+        """
+        Matches every rule against a description in one pass.
+
+        Args:
+            text (str): The description.
+
+        Yields:
+            RuleMatch: Non-overlapping matches ordered by start offset.
+        """
+        if self.pattern is None:
+            return
+        for m in self.pattern.finditer(text):
+            i = int(m.lastgroup[1:])
+            rule = self.rules[i]
+            groups = {name: m.group(prefixed) for prefixed, name in self.group_names[i] if m.group(prefixed) is not None}
+            day_text = groups.get("day") or groups.get("days") or ""
+            days = tuple(_day_name_pattern.findall(day_text.lower()))
+            value = None
+            if "sh" in groups:
+                value = (groups["sh"], groups.get("sm"), groups.get("eh"), groups.get("em"))
+            yield RuleMatch(rule, m.start(), m.end(), days, value)
+
+    def hit_counts(self):
+        """
+        Returns:
+            dict: Rule name -> slots it assigned. Only extractions run in this process count:
+            descriptions served from a cache aren't matched again, and a worker process counts
+            in its own copy of the rules, so a parallel caller has to send each worker's counts
+            back with its results and add them up.
+        """
+        return {rule.name: rule.hits for rule in self.rules}
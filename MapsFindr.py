@@ -22,63 +22,116 @@
 
 
 import os
-import gradio as gr
-from dotenv import load_dotenv
-from langchain_ollama import OllamaLLM
-from langchain_core.tools import tool
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_core.messages import AIMessage, HumanMessage
-from langchain.agents.format_scratchpad import format_log_to_str
-import subprocess
 import json
-import tempfile
+import functools
+import asyncio
+from collections import namedtuple
 
-# Load environment variables from .env file
-load_dotenv()
+from agent_pool import AgentPool
+from mcp_client import AsyncMcpClient
+from query_cache import TtlCache
+from query_router import DIRECT, format_places, route_query
+
+Settings = namedtuple("Settings", [
+    # Seconds a whole search may take, and seconds a single Maps call may take within it
+    "request_timeout", "tool_timeout",
+    # Searches waiting for a free agent beyond this are turned away by the Gradio queue
+    "queue_size",
+    "cache_path", "cache_size", "answer_cache_ttl", "tool_cache_ttl",
+    "agent_max_iterations", "agent_verbose", "agent_pool_size", "warmup_query",
+])
+
+# The environment is read on first use rather than on import, so that init() and the __main__
+# block can load the .env file first (python-dotenv is imported there, not here).
+@functools.cache
+def settings():
+    return Settings(
+        request_timeout=float(os.getenv("MAPS_REQUEST_TIMEOUT", "120")),
+        tool_timeout=float(os.getenv("MAPS_TOOL_TIMEOUT", "30")),
+        queue_size=int(os.getenv("MAPS_QUEUE_SIZE", "64")),
+        cache_path=os.getenv("MAPS_CACHE_PATH") or None,
+        cache_size=int(os.getenv("MAPS_CACHE_SIZE", "1000")),
+        answer_cache_ttl=float(os.getenv("MAPS_ANSWER_CACHE_TTL", "3600")),
+        tool_cache_ttl=float(os.getenv("MAPS_TOOL_CACHE_TTL", "86400")),
+        agent_max_iterations=int(os.getenv("MAPS_AGENT_MAX_ITERATIONS", "4")),
+        agent_verbose=os.getenv("MAPS_AGENT_VERBOSE", "") not in ("", "0", "false"),
+        agent_pool_size=int(os.getenv("MAPS_AGENT_POOL_SIZE", "8")),
+        warmup_query=os.getenv("MAPS_WARMUP_QUERY", ""),
+    )
+
+def load_env():
+    # Loads the .env file; it only counts when called before the first settings() or maps_client()
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# One Google Maps MCP server for the whole process, started on the first search.
+# Set MAPS_MCP_COMMAND to run another server (e.g. "python mcp_stub_server.py" offline).
+# The server exits on its own when this process closes its stdin.
+@functools.cache
+def maps_client():
+    return AsyncMcpClient(env={"GOOGLE_MAPS_API_KEY": os.getenv("GOOGLE_MAPS_API_KEY", "")},
+                          timeout=settings().tool_timeout)
+
+# Two cache levels: final answers by user query, and raw Maps results by tool query so that
+# different agent phrasings of the same place share one fetch. MAPS_CACHE_PATH keeps both in a
+# SQLite file across restarts. Errors are never cached.
+@functools.cache
+def answer_cache():
+    return TtlCache("answers", ttl=settings().answer_cache_ttl,
+                    max_entries=settings().cache_size, store_path=settings().cache_path)
+
+@functools.cache
+def tool_cache():
+    return TtlCache("maps_search_places", ttl=settings().tool_cache_ttl,
+                    max_entries=settings().cache_size, store_path=settings().cache_path)
+
+def cache_stats():
+    return {"answers": answer_cache().stats(), "maps_search_places": tool_cache().stats()}
+
+async def maps_search(query):
+    # Raw maps_search_places output, through the tool cache; raises on MCP errors and timeouts
+    cached = tool_cache().get(query)
+    if cached is not None:
+        return cached
+    result = await maps_client().call_tool("maps_search_places", {"query": query})
+    tool_cache().put(query, result)
+    return result
+
+# The tool reports failures to the agent as text starting with this, so run_agent can tell them apart
+TOOL_ERROR_PREFIX = "Error with MCP search: "
 
 # 1. First define the tool with proper initialization
-@tool
-def search_maps_mcp(query: str) -> str:
+async def search_maps_mcp(query: str) -> str:
     """Search for information on Google Maps using MCP."""
     try:
-        # Create a temporary JSON file to store the query
-        with tempfile.NamedTemporaryFile(mode='w+', suffix='.json', delete=False) as temp:
-            json.dump({"input": query}, temp)
-            temp_path = temp.name
-
-        # Set environment variables
-        env = os.environ.copy()
-        env["GOOGLE_MAPS_API_KEY"] = os.getenv("GOOGLE_MAPS_API_KEY", "")
-
-        # Execute the MCP command
-        result = subprocess.run(
-            ["npx", "-y", "@modelcontextprotocol/server-google-maps"],
-            input=json.dumps({"input": query}),
-            text=True,
-            capture_output=True,
-            env=env
-        )
-
-        # Parse the output
-        if result.returncode == 0 and result.stdout:
-            try:
-                output = json.loads(result.stdout)
-                return output.get("output", result.stdout)
-            except json.JSONDecodeError:
-                return result.stdout
-        else:
-            return f"Error: {result.stderr}"
+        return await maps_search(query)
+    except asyncio.TimeoutError:
+        return f"{TOOL_ERROR_PREFIX}no answer from Google Maps after {settings().tool_timeout:.0f}s"
     except Exception as e:
-        return f"Error with MCP search: {str(e)}"
+        return f"{TOOL_ERROR_PREFIX}{str(e)}"
+
+# LangChain and Gradio take seconds to import, so they are imported on first use: by the first
+# agent built, or by build_demo(). Importing this module (e.g. for search_maps) stays fast.
+@functools.cache
+def search_maps_tool():
+    from langchain_core.tools import tool
+    return tool(search_maps_mcp)
+
+# A ReAct run stops after settings().agent_max_iterations tool calls instead of looping on a confused model.
+# What AgentExecutor returns as its output when early_stopping_method="force" stops a run
+FORCED_STOP_OUTPUT = "Agent stopped due to iteration limit or time limit."
 
 # 2. Then create the agent components
 def create_search_agent():
+    from langchain_ollama import OllamaLLM
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_react_agent
+
     # Initialize the LLM
     llm = OllamaLLM(model="llama3.2")
 
     # Create tools list with the properly defined tool
-    tools = [search_maps_mcp]
+    tools = [search_maps_tool()]
 
     # Create ReAct prompt template
     react_prompt = ChatPromptTemplate.from_messages([
@@ -98,38 +151,156 @@ Final Answer: Organized response"""),
 
     # Create agent with proper formatting
     agent = create_react_agent(llm, tools, react_prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=settings().agent_verbose,
+                                   max_iterations=settings().agent_max_iterations, early_stopping_method="force")
 
     return agent_executor
 
+# Agents are built when searches first need them, or all at once by init(), and lent out per request.
+# MAPS_AGENT_POOL_SIZE sets how many requests can run an agent at the same time.
+# MAPS_WARMUP_QUERY, when set, is run once at startup so Ollama has the model loaded.
+@functools.cache
+def agent_pool():
+    return AgentPool(create_search_agent, size=settings().agent_pool_size, lazy=True)
+
 # 3. Main processing function
-def search_maps(query):
+RESULTS_HEADER = "## Google Maps Search Results\n\n"
+
+async def search_maps(query):
+    # Yields the Markdown shown so far: Gradio streams each yield into the output component.
+    # Cancelling the Gradio event cancels this generator, and with it the agent run and Maps call.
     if not query.strip():
-        return "Please enter a search query."
+        yield "Please enter a search query."
+        return
+
+    cached = answer_cache().get(query)
+    if cached is not None:
+        yield cached
+        return
+
+    # Plain place lookups go straight to the Maps tool and skip the LLM
+    if route_query(query) == DIRECT:
+        yield f"{RESULTS_HEADER}Searching Google Maps for *{query.strip()}*…"
+        try:
+            places = format_places(await maps_search(query))
+        except asyncio.TimeoutError:
+            yield f"Error: no answer from Google Maps after {settings().tool_timeout:.0f}s."
+            return
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        if places is not None:
+            answer = RESULTS_HEADER + places
+            answer_cache().put(query, answer)
+            yield answer
+            return
+        # Nothing found for the literal query: let the agent rephrase it
 
     try:
-        agent = create_search_agent()
-        response = agent.invoke({"input": query})
-        return f"## Google Maps Search Results\n\n{response.get('output', 'No results found.')}"
+        async for answer in run_agent(query):
+            yield answer
+    except asyncio.TimeoutError:
+        yield f"Error: the search took longer than {settings().request_timeout:.0f}s and was stopped."
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
+
+async def run_agent(query):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings().request_timeout
+    progress = []
+    output = None
+    # An answer written after a failed Maps call isn't cached: the failure may be temporary
+    tool_failed = False
+    # Nor is a forced stop: the executor only stops a run once it has taken agent_max_iterations steps
+    steps = 0
+    async with agent_pool().alease(timeout=settings().request_timeout) as agent:
+        stream = agent.astream({"input": query})
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                for action in chunk.get("actions", []):
+                    tool_input = action.tool_input if isinstance(action.tool_input, str) else json.dumps(action.tool_input, ensure_ascii=False)
+                    progress.append(f"- Searching Google Maps for *{tool_input}*…")
+                    yield RESULTS_HEADER + "\n".join(progress)
+                for step in chunk.get("steps", []):
+                    steps += 1
+                    if str(step.observation).startswith(TOOL_ERROR_PREFIX):
+                        tool_failed = True
+                if "output" in chunk:
+                    output = chunk["output"]
+        finally:
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+    answer = RESULTS_HEADER + (output if output is not None else "No results found.")
+    stopped = steps >= settings().agent_max_iterations or output == FORCED_STOP_OUTPUT
+    if output is not None and not tool_failed and not stopped:
+        answer_cache().put(query, answer)
+    yield answer
 
 # 4. Gradio interface setup
-with gr.Blocks(theme=gr.themes.Soft()) as demo:
-    gr.Markdown("""# 🗺️ Google Maps Search Assistant (MCP)""")
+def build_demo():
+    import gradio as gr
+
+    with gr.Blocks(theme=gr.themes.Soft()) as demo:
+        gr.Markdown("""# 🗺️ Google Maps Search Assistant (MCP)""")
 
-    with gr.Row():
-        query_input = gr.Textbox(
-            placeholder="Enter location search query...",
-            label="Search Query",
-            lines=2
-        )
+        with gr.Row():
+            query_input = gr.Textbox(
+                placeholder="Enter location search query...",
+                label="Search Query",
+                lines=2
+            )
 
-    search_button = gr.Button("🔍 Search", variant="primary")
-    output = gr.Markdown()
+        with gr.Row():
+            search_button = gr.Button("🔍 Search", variant="primary")
+            cancel_button = gr.Button("Cancel")
+        output = gr.Markdown()
 
-    search_button.click(fn=search_maps, inputs=query_input, outputs=output)
-    query_input.submit(fn=search_maps, inputs=query_input, outputs=output)
+        search_events = [
+            search_button.click(fn=search_maps, inputs=query_input, outputs=output),
+            query_input.submit(fn=search_maps, inputs=query_input, outputs=output),
+        ]
+        cancel_button.click(fn=None, inputs=None, outputs=None, cancels=search_events)
+
+    # As many searches run at once as there are pooled agents; the rest wait in the queue
+    demo.queue(default_concurrency_limit=settings().agent_pool_size, max_size=settings().queue_size)
+    return demo
+
+# Gradio's reload mode and existing imports read MapsFindr.demo: built on first access
+def __getattr__(name):
+    if name == "demo":
+        global demo
+        demo = build_demo()
+        return demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def init():
+    # Loads the .env file and builds every pooled agent now instead of on the first searches;
+    # returns the number built. Call it before the first search for .env to count.
+    load_env()
+    return agent_pool().fill()
+
+async def warm_up(query):
+    try:
+        return await agent_pool().awarm_up(query)
+    finally:
+        # The MCP server is bound to this temporary event loop; Gradio's loop starts its own
+        await maps_client().close()
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    load_env()
+    warmup_query = settings().warmup_query
+    if warmup_query:
+        print(f"Warming up the agent pool with {warmup_query!r}...")
+        try:
+            init()
+            print(f"Warm-up done in {asyncio.run(warm_up(warmup_query)):.1f}s")
+        except Exception as e:
+            print(f"Warm-up failed: {str(e)}")
+    build_demo().launch()
@@ -0,0 +1,174 @@
+import asyncio
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+class AgentPool(object):
+    '''
+    Fixed set of agents built once at startup and lent out one request at a time.
+
+    A request borrows an agent for the duration of its call, so agents never serve two
+    requests at once. When all agents are busy, callers wait (up to timeout) for one to be
+    returned.
+
+    A lazy pool builds no agent up front: a request finding every built agent busy builds a new
+    one until the pool holds size agents, and fill() builds the rest at once.
+    '''
+
+    def __init__(self, factory, size=1, lazy=False):
+        if size < 1:
+            raise ValueError(f"Agent pool size should be at least 1. Got {size} instead")
+        self.factory = factory
+        self.size = size
+        self.agents = queue.Queue()
+        self.built = 0
+        self.build_seconds = 0.0
+        self.warmup_seconds = None
+        self.lock = threading.Lock()
+        if not lazy:
+            self.fill()
+
+    def _build(self):
+        # Reserves a slot under the lock, builds outside it so slow factories run in parallel
+        with self.lock:
+            if self.built >= self.size:
+                return None
+            self.built += 1
+        started = time.perf_counter()
+        try:
+            agent = self.factory()
+        except BaseException:
+            with self.lock:
+                self.built -= 1
+            raise
+        with self.lock:
+            self.build_seconds += time.perf_counter() - started
+        return agent
+
+    def _keep_built(self, build):
+        # Done callback of a build whose caller was cancelled. A failed build already gave its
+        # slot back in _build; the exception is retrieved so asyncio doesn't log it as unhandled.
+        if build.cancelled() or build.exception() is not None:
+            return
+        agent = build.result()
+        if agent is not None:
+            self.agents.put(agent)
+
+    def fill(self):
+        """
+        Builds the agents not built yet.
+
+        Returns:
+            int: The number of agents built.
+        """
+        count = 0
+        while True:
+            agent = self._build()
+            if agent is None:
+                return count
+            self.agents.put(agent)
+            count += 1
+
+    def _take(self, timeout=None):
+        # A free agent, a newly built one while the pool isn't full, or queue.Empty after timeout
+        try:
+            return self.agents.get_nowait()
+        except queue.Empty:
+            agent = self._build()
+            if agent is not None:
+                return agent
+        return self.agents.get(timeout=timeout)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Borrows an agent for the duration of a with block.
+
+        Args:
+            timeout (float): Seconds to wait for a free agent. Waits forever by default.
+
+        Yields:
+            The agent. It goes back to the pool when the block exits, even on error.
+        """
+        try:
+            agent = self._take(timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No agent available after {timeout}s ({self.size} in the pool)")
+        try:
+            yield agent
+        finally:
+            self.agents.put(agent)
+
+    @asynccontextmanager
+    async def alease(self, timeout=None, poll_interval=0.05):
+        """
+        Borrows an agent from a coroutine without blocking the event loop.
+
+        Args:
+            timeout (float): Seconds to wait for a free agent. Waits forever by default.
+            poll_interval (float): Seconds between checks while every agent is busy.
+
+        Yields:
+            The agent. It goes back to the pool when the block exits, even on error or cancellation.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                agent = self.agents.get_nowait()
+                break
+            except queue.Empty:
+                if self.built < self.size:
+                    # Built on a thread: the first build also imports the agent's dependencies
+                    build = asyncio.ensure_future(asyncio.to_thread(self._build))
+                    try:
+                        agent = await asyncio.shield(build)
+                    except asyncio.CancelledError:
+                        # The build carries on in its thread and its agent joins the pool
+                        build.add_done_callback(self._keep_built)
+                        raise
+                    if agent is not None:
+                        break
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"No agent available after {timeout}s ({self.size} in the pool)")
+                await asyncio.sleep(poll_interval)
+        try:
+            yield agent
+        finally:
+            self.agents.put(agent)
+
+    def invoke(self, inputs, timeout=None):
+        with self.lease(timeout) as agent:
+            return agent.invoke(inputs)
+
+    def warm_up(self, query):
+        """
+        Runs one query through a pooled agent so the model is loaded before the first real request.
+
+        Args:
+            query (str): The warm-up query.
+
+        Returns:
+            float: Seconds taken by the warm-up query.
+        """
+        started = time.perf_counter()
+        self.invoke({"input": query})
+        with self.lock:
+            self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+    async def awarm_up(self, query):
+        """
+        Same as warm_up, for pools whose agents use async tools.
+        """
+        started = time.perf_counter()
+        async with self.alease() as agent:
+            await agent.ainvoke({"input": query})
+        with self.lock:
+            self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+    def available(self):
+        # Agents not built yet count as available: a request would build one
+        return self.agents.qsize() + self.size - self.built
@@ -0,0 +1,134 @@
+"""
+Import-time guard: imports each entry point in a fresh interpreter with `python -X importtime`
+and fails when an import got slow again.
+
+    python check_import_time.py                 # exits 1 on a regression
+    python check_import_time.py --top 10        # also lists the slowest imports of each target
+
+A target fails when it imports one of its deferred dependencies (the JVM bridge, pandas,
+LangChain, Gradio, python-dotenv: these load on first use) or when its cumulative import time is over budget.
+The deferred-dependency check is exact; the budgets are loose so that a slower machine doesn't fail them.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import namedtuple
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+timeextractor_dir = os.path.join(project_dir, "Job", "timeextractor")
+
+Target = namedtuple("Target", ["name", "directory", "module", "deferred", "budget_ms"])
+
+TARGETS = [
+    Target("MapsFindr", project_dir, "MapsFindr",
+           ("gradio", "langchain", "langchain_core", "langchain_ollama", "dotenv"), 150),
+    Target("extractor", os.path.join(timeextractor_dir, "modules"), "extractor", ("jnius",), 100),
+    Target("extract_hours_days", timeextractor_dir, "extract_hours_days", ("pandas", "numpy"), 200),
+    Target("output_time_json", timeextractor_dir, "output_time_json", ("pandas", "numpy"), 200),
+    Target("occurrences", timeextractor_dir, "occurrences", ("pandas", "numpy"), 250),
+    Target("schedule_index", timeextractor_dir, "schedule_index", ("pandas", "numpy"), 100),
+]
+
+# import time:  self [us] | cumulative | imported package
+_line_pattern = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+Measure = namedtuple("Measure", ["cumulative_us", "imports"])
+
+
+def measure(target):
+    """
+    Imports target.module in a new interpreter started in target.directory.
+
+    Returns:
+        Measure: The cumulative import time of the module in microseconds, and the
+        (module, self us, cumulative us) of every module it imported.
+
+    Raises:
+        RuntimeError: When the import fails.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target.module}"],
+                             cwd=target.directory, capture_output=True, text=True)
+    if process.returncode != 0:
+        last_line = process.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise RuntimeError(f"import {target.module} failed: {last_line[0]}")
+    imports = []
+    cumulative_us = None
+    for line in process.stderr.splitlines():
+        m = _line_pattern.match(line)
+        if m is None:
+            continue
+        self_us, module_cumulative_us, indent, module = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        imports.append((module, self_us, module_cumulative_us))
+        # The target itself is the last top-level line
+        if module == target.module and len(indent) == 1:
+            cumulative_us = module_cumulative_us
+    if cumulative_us is None:
+        raise RuntimeError(f"No import time reported for {target.module}")
+    return Measure(cumulative_us, imports)
+
+
+def check(target, repeat=3):
+    """
+    Returns:
+        dict: "ms" (best cumulative time of repeat imports), "budget_ms", "deferred_imported"
+        (the deferred packages the import pulled in), "slowest" (module, cumulative ms of the
+        best run) and "ok".
+    """
+    best = min((measure(target) for _ in range(repeat)), key=lambda found: found.cumulative_us)
+    imported = {module.split(".")[0] for module, _, _ in best.imports}
+    deferred_imported = sorted(imported & set(target.deferred))
+    ms = best.cumulative_us / 1000
+    slowest = sorted(best.imports, key=lambda item: -item[2])
+    return {
+        "ms": ms,
+        "budget_ms": target.budget_ms,
+        "deferred_imported": deferred_imported,
+        "slowest": [(module, cumulative_us / 1000) for module, _, cumulative_us in slowest],
+        "ok": not deferred_imported and ms <= target.budget_ms,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when importing an entry point got slow again.")
+    parser.add_argument("targets", nargs="*", metavar="TARGET",
+                        help=f"Targets to check, all by default: {', '.join(target.name for target in TARGETS)}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per target; the fastest is kept.")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiplies every time budget (e.g. 2 on slow CI runners).")
+    parser.add_argument("--top", type=int, default=0, metavar="N", help="List the N slowest imports of each target.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+    unknown = set(args.targets) - {target.name for target in TARGETS}
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    targets = [target for target in TARGETS if not args.targets or target.name in args.targets]
+    results = {}
+    for target in targets:
+        target = target._replace(budget_ms=target.budget_ms * args.budget_scale)
+        try:
+            results[target.name] = check(target, args.repeat)
+        except RuntimeError as e:
+            results[target.name] = {"error": str(e), "ok": False}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            if "error" in result:
+                print(f"{name:<20} ERROR  {result['error']}")
+                continue
+            status = "ok" if result["ok"] else "FAIL"
+            print(f"{name:<20} {status:<5} {result['ms']:7.1f} ms (budget {result['budget_ms']:.0f} ms)")
+            if result["deferred_imported"]:
+                print(f"{'':<20} imports deferred packages: {', '.join(result['deferred_imported'])}")
+            for module, ms in result["slowest"][:args.top]:
+                print(f"{'':<20}   {ms:7.1f} ms  {module}")
+    if not all(result["ok"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Headless batch geo-enrichment: looks up the place of every event of the Supabase export
+through the Google Maps MCP server.
+
+    python enrich_events.py -o events_places.ndjson --concurrency 4 --rate 5
+    python enrich_events.py -o events_places.parquet          # needs pyarrow
+
+Each completed lookup is appended to a checkpoint file as soon as it finishes, so a crashed
+or interrupted run started again with the same arguments only looks up the missing places.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from mcp_client import AsyncMcpClient
+from query_cache import normalize_query
+
+project_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(project_dir, "Job", "timeextractor", "Supabase_Snippet_Event_Management_Table.csv")
+
+# Words that introduce a venue; the venue name is the capitalized words that follow
+venue_words = ["office de tourisme", "base nautique", "médiathèque", "bibliothèque", "conservatoire", "auditorium",
+               "capitainerie", "cathédrale", "esplanade", "promenade", "boulevard", "chapelle", "librairie",
+               "galerie", "théâtre", "cinéma", "château", "domaine", "gymnase", "cloître", "abbaye", "avenue",
+               "arènes", "église", "espace", "maison", "jardins?", "halles?", "mairie", "moulin", "palais",
+               "parvis", "centre", "atelier", "musée", "place", "salle", "plage", "stade", "étang", "allées",
+               "quai", "parc", "port", "hôtel", "cave", "site", "rue", "île"]
+_upper = "A-ZÀÂÄÇÉÈÊËÎÏÔÖÙÛÜ"
+_lower = "a-zàâäçéèêëîïôöùûüœ"
+_name_word = rf"[{_upper}][\w'’-]*"
+_connector = r"(?:de|du|des|la|le|les|d'|d’|l'|l’|en|sur|et|aux|au)"
+
+# "salle Jean Moulin", "place de la République", "cave coopérative de Paulhan": venue word, an
+# optional lowercase qualifier, then capitalized words joined by connectors on the same line
+venue_pattern = re.compile(
+    rf"(?<!\w)(?P<place>(?i:{'|'.join(venue_words)})(?:[ \t]+[{_lower}]{{4,}})?"
+    rf"(?:[ \t]+(?:{_connector}[ \t]*)*{_name_word})+)"
+)
+# "à Montpellier", "à Saint-Gervais-sur-Mare"
+town_pattern = re.compile(rf"\bà\s+(?P<town>[{_upper}][{_lower}]+(?:[- ](?:(?:sur|de|les|la|le|en)[- ])?[{_upper}][\w'-]+)*)")
+not_towns = {"Pâques", "Noël", "Partir", "Midi"} | {word.capitalize() for word in (
+    "janvier février mars avril mai juin juillet août septembre octobre novembre décembre "
+    "lundi mardi mercredi jeudi vendredi samedi dimanche").split()}
+
+
+def extract_place(description, near=""):
+    """
+    Pulls the place of an event out of its description.
+
+    Args:
+        description (str): The event description.
+        near (str): Area appended to the query when the description names no town (e.g. "Hérault").
+
+    Returns:
+        str: A Maps query such as "Salle Jean Moulin, Graissessac", or None when no venue is named.
+    """
+    if not isinstance(description, str):
+        return None
+    venue = venue_pattern.search(description)
+    if venue is None:
+        return None
+    place = venue.group("place")
+    for m in town_pattern.finditer(description):
+        town = m.group("town")
+        if town.split()[0] not in not_towns:
+            if town not in place:
+                place = f"{place}, {town}"
+            break
+    else:
+        if near:
+            place = f"{place}, {near}"
+    return place
+
+
+def group_places(rows, near=""):
+    """
+    Extracts the place of every event and groups the events by place.
+
+    Args:
+        rows (iterable): (event id, description) pairs.
+        near (str): See extract_place.
+
+    Returns:
+        dict: Normalized query -> {"query": first spelling seen, "event_ids": [...]}, in first-seen order.
+    """
+    places = {}
+    for event_id, description in rows:
+        query = extract_place(description, near)
+        if query is None:
+            continue
+        entry = places.setdefault(normalize_query(query), {"query": query, "event_ids": []})
+        entry["event_ids"].append(event_id)
+    return places
+
+
+def load_checkpoint(path):
+    """
+    Reads the lookups finished by earlier runs.
+
+    Args:
+        path (str): The checkpoint NDJSON file.
+
+    Returns:
+        dict: Normalized query -> the last record written for it.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb") as checkpoint:
+        data = checkpoint.read()
+    # A run killed mid-write can leave a truncated last line, possibly cut inside a multibyte
+    # character: only complete lines are decoded
+    for line in data[:data.rfind(b"\n") + 1].splitlines():
+        try:
+            record = json.loads(line.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+        done[record["key"]] = record
+    return done
+
+
+def drop_partial_line(path):
+    """
+    Cuts a checkpoint after its last line break, so the next record starts on its own line.
+
+    Args:
+        path (str): The checkpoint NDJSON file. Nothing is done if it doesn't exist.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as checkpoint:
+        data = checkpoint.read()
+        checkpoint.truncate(data.rfind(b"\n") + 1)
+
+
+class RateLimiter(object):
+    '''
+    Spaces out the start of calls so that at most rate calls start per second.
+    '''
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def parse_result(text):
+    try:
+        return json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return text
+
+
+async def enrich(places, checkpoint_path, client, concurrency=4, rate=5.0, retry_errors=True):
+    """
+    Looks every place up, skipping the ones already in the checkpoint, and appends each result to it.
+
+    Args:
+        places (dict): Output of group_places.
+        checkpoint_path (str): The checkpoint NDJSON file.
+        client (AsyncMcpClient): The MCP client.
+        concurrency (int): Maximum lookups in flight.
+        rate (float): Maximum lookups started per second (0 for no limit).
+        retry_errors (bool): Look up again the places whose earlier lookup failed.
+
+    Returns:
+        dict: Counts of "done" (this run), "skipped" (from the checkpoint) and "errors" (this run).
+    """
+    done = load_checkpoint(checkpoint_path)
+    todo = [key for key in places
+            if key not in done or (retry_errors and done[key].get("error") is not None)]
+    stats = {"done": 0, "skipped": len(places) - len(todo), "errors": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    started = time.perf_counter()
+
+    drop_partial_line(checkpoint_path)
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        async def lookup(key):
+            place = places[key]
+            async with semaphore:
+                await limiter.wait()
+                record = {"key": key, "query": place["query"], "event_ids": place["event_ids"],
+                          "result": None, "error": None}
+                try:
+                    record["result"] = parse_result(await client.call_tool("maps_search_places", {"query": place["query"]}))
+                except Exception as e:
+                    record["error"] = str(e) or type(e).__name__
+                    stats["errors"] += 1
+            # Written and flushed one line at a time so a crash loses at most the lookups in flight
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            stats["done"] += 1
+            if stats["done"] % 50 == 0 or stats["done"] == len(todo):
+                elapsed = time.perf_counter() - started
+                print(f"{stats['done']}/{len(todo)} places looked up ({stats['errors']} errors, "
+                      f"{stats['done'] / elapsed:.1f}/s)", file=sys.stderr)
+
+        await asyncio.gather(*(lookup(key) for key in todo))
+    return stats
+
+
+def write_output(checkpoint_path, output_path, output_format):
+    """
+    Writes the final results, one record per place, from the checkpoint.
+
+    Args:
+        checkpoint_path (str): The checkpoint NDJSON file.
+        output_path (str): The output file.
+        output_format (str): "ndjson" or "parquet".
+    """
+    records = list(load_checkpoint(checkpoint_path).values())
+    for record in records:
+        record.pop("key", None)
+    if output_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow), or use an .ndjson output")
+        # Results are free-form JSON, kept as JSON text in the Parquet column
+        table = pa.Table.from_pylist([
+            dict(record, result=None if record["result"] is None else json.dumps(record["result"], ensure_ascii=False))
+            for record in records
+        ])
+        pq.write_table(table, output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8") as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def iter_events(csv_file, id_column="id", description_column="description"):
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row.get(id_column), row.get(description_column)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up the place of every event of a CSV export through the Google Maps MCP server.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_CSV, help="CSV file with id and description columns.")
+    parser.add_argument("-o", "--output", default="events_places.ndjson", help="Output file (.ndjson or .parquet).")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], help="Output format. Defaults to the output file extension.")
+    parser.add_argument("--checkpoint", help="Checkpoint file. Defaults to <output>.checkpoint.ndjson.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum lookups in flight.")
+    parser.add_argument("--rate", type=float, default=5.0, help="Maximum lookups started per second (0 for no limit).")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a single lookup is abandoned.")
+    parser.add_argument("--near", default="Hérault", help="Area added to places when the description names no town.")
+    parser.add_argument("--limit", type=int, help="Only look up the first N distinct places.")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--description-column", default="description")
+    args = parser.parse_args(argv)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "ndjson")
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint.ndjson"
+    csv.field_size_limit(2 ** 31 - 1)
+
+    places = group_places(iter_events(args.input, args.id_column, args.description_column), args.near)
+    if args.limit is not None:
+        places = dict(list(places.items())[:args.limit])
+    print(f"{sum(len(place['event_ids']) for place in places.values())} events at {len(places)} distinct places",
+          file=sys.stderr)
+
+    async def run():
+        async with AsyncMcpClient(env={"GOOGLE_MAPS_API_KEY": os.getenv("GOOGLE_MAPS_API_KEY", "")},
+                                  timeout=args.timeout) as client:
+            return await enrich(places, checkpoint_path, client, args.concurrency, args.rate)
+
+    stats = asyncio.run(run())
+    print(f"{stats['done']} looked up, {stats['skipped']} from checkpoint, {stats['errors']} errors", file=sys.stderr)
+    write_output(checkpoint_path, args.output, output_format)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+import asyncio
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+
+PROTOCOL_VERSION = "2024-11-05"
+DEFAULT_SERVER_COMMAND = "npx -y @modelcontextprotocol/server-google-maps"
+
+
+class McpError(Exception):
+    """Error reply from the MCP server, or a tool call that reported isError."""
+
+    def __init__(self, message, code=None, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class McpServerExited(McpError):
+    """The server process exited (or closed its stdout) before replying."""
+
+
+def server_command(command=None):
+    """
+    Resolves the command line of the MCP server.
+
+    Args:
+        command (str or list): Explicit command. Defaults to the MAPS_MCP_COMMAND environment
+            variable, then to the Google Maps MCP server run through npx.
+
+    Returns:
+        list: The command split into arguments.
+    """
+    command = command or os.getenv("MAPS_MCP_COMMAND") or DEFAULT_SERVER_COMMAND
+    return shlex.split(command) if isinstance(command, str) else list(command)
+
+
+def _initialize_params(client_name):
+    return {
+        "protocolVersion": PROTOCOL_VERSION,
+        "capabilities": {},
+        "clientInfo": {"name": client_name, "version": "1.0"},
+    }
+
+
+def _parse_message(line):
+    # Servers may log to stdout before the protocol starts; anything that isn't a JSON object is skipped
+    try:
+        message = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return message if isinstance(message, dict) else None
+
+
+def _reply_to_server_request(message):
+    if message["method"] == "ping":
+        return {"jsonrpc": "2.0", "id": message["id"], "result": {}}
+    return {"jsonrpc": "2.0", "id": message["id"],
+            "error": {"code": -32601, "message": f"Method not found: {message['method']}"}}
+
+
+def _error_from_reply(message):
+    error = message["error"]
+    return McpError(error.get("message", "MCP error"), error.get("code"), error.get("data"))
+
+
+def _tool_text(name, result):
+    text = "\n".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
+    if result.get("isError"):
+        raise McpError(text or f"Tool {name} failed")
+    return text
+
+
+def _exit_error(returncode, stderr_tail):
+    stderr = "".join(stderr_tail).strip()
+    return McpServerExited(f"MCP server exited with code {returncode}" + (f": {stderr}" if stderr else ""))
+
+
+class McpClient(object):
+    '''
+    Long-lived client for an MCP server speaking newline-delimited JSON-RPC over stdio.
+
+    The server is started on the first request and kept running. Requests from several
+    threads share the one process: each gets its own JSON-RPC id and a reader thread hands
+    every reply to the request waiting for it. If the server dies, the requests in flight
+    fail with McpServerExited and the next request starts a fresh server (a request that hit
+    the crash is retried once on the new one).
+    '''
+
+    def __init__(self, command=None, env=None, timeout=30, client_name="MapsFindr"):
+        self.command = server_command(command)
+        self.env = env or {}
+        self.timeout = timeout
+        self.client_name = client_name
+        self.process = None
+        self.server_info = None
+        self.restarts = 0
+        self.ids = itertools.count(1)
+        self.pending = {}
+        # pids of server processes whose output has ended
+        self.closed = set()
+        self.stderr_tail = deque(maxlen=50)
+        self.start_lock = threading.RLock()
+        self.write_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the server and runs the MCP initialize handshake, unless it is already running.
+
+        Returns:
+            subprocess.Popen: The running server process.
+        """
+        with self.start_lock:
+            process = self.process
+            if process is not None and process.poll() is None:
+                return process
+            if self.server_info is not None:
+                self.restarts += 1
+            env = os.environ.copy()
+            env.update(self.env)
+            self.stderr_tail.clear()
+            process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+            self.process = process
+            threading.Thread(target=self._read_loop, args=(process,), daemon=True).start()
+            threading.Thread(target=self._drain_stderr, args=(process,), daemon=True).start()
+            try:
+                self.server_info = self._request(process, "initialize", _initialize_params(self.client_name), self.timeout)
+                self._send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            except Exception:
+                self._stop(process)
+                raise
+            return process
+
+    def _read_loop(self, process):
+        for line in process.stdout:
+            message = _parse_message(line)
+            if message is None:
+                continue
+            if "method" in message:
+                if "id" in message:
+                    try:
+                        self._send(process, _reply_to_server_request(message))
+                    except McpServerExited:
+                        pass
+                continue
+            with self.pending_lock:
+                entry = self.pending.pop(message.get("id"), None)
+            if entry is None:
+                continue
+            future = entry[1]
+            if "error" in message:
+                future.set_exception(_error_from_reply(message))
+            else:
+                future.set_result(message.get("result"))
+        process.wait()
+        self._fail_pending(process, _exit_error(process.returncode, self.stderr_tail))
+        with self.start_lock:
+            if self.process is process:
+                self.process = None
+
+    def _drain_stderr(self, process):
+        # Keeps the stderr pipe from filling up and blocking the server; the tail goes into error messages
+        for line in process.stderr:
+            self.stderr_tail.append(line)
+
+    def _fail_pending(self, process, error):
+        # Only the requests sent to this process: a replacement may already be serving new ones
+        with self.pending_lock:
+            # Requests registered after this point fail straight away instead of waiting for a reply
+            self.closed.add(process.pid)
+            failed = [request_id for request_id, (owner, _) in self.pending.items() if owner is process]
+            futures = [self.pending.pop(request_id)[1] for request_id in failed]
+        for future in futures:
+            future.set_exception(error)
+
+    def _send(self, process, message):
+        line = json.dumps(message, ensure_ascii=False) + "\n"
+        try:
+            with self.write_lock:
+                process.stdin.write(line)
+                process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise McpServerExited(f"MCP server is not accepting requests: {e!r}")
+
+    def _request(self, process, method, params, timeout):
+        request_id = next(self.ids)
+        future = Future()
+        with self.pending_lock:
+            if process.pid in self.closed:
+                raise McpServerExited(f"MCP server exited with code {process.returncode}")
+            self.pending[request_id] = (process, future)
+        try:
+            self._send(process, {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            return future.result(timeout)
+        except TimeoutError:
+            raise TimeoutError(f"MCP request {method} timed out after {timeout}s")
+        finally:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+
+    def request(self, method, params=None, timeout=None):
+        """
+        Sends a JSON-RPC request and waits for its reply. Safe to call from several threads at once.
+
+        Args:
+            method (str): The JSON-RPC method, e.g. "tools/call".
+            params (dict): The request parameters.
+            timeout (float): Seconds to wait for the reply. Defaults to the client timeout.
+
+        Returns:
+            The result member of the reply.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return self._request(self.start(), method, params, timeout)
+        except McpServerExited:
+            # The server crashed under this request: start a new one and try once more
+            return self._request(self.start(), method, params, timeout)
+
+    def list_tools(self):
+        return self.request("tools/list").get("tools", [])
+
+    def call_tool(self, name, arguments, timeout=None):
+        """
+        Calls an MCP tool and returns its text output.
+
+        Args:
+            name (str): The tool name, e.g. "maps_search_places".
+            arguments (dict): The tool arguments.
+            timeout (float): Seconds to wait for the reply. Defaults to the client timeout.
+
+        Returns:
+            str: The text content items of the result, joined by line breaks.
+        """
+        result = self.request("tools/call", {"name": name, "arguments": arguments}, timeout)
+        return _tool_text(name, result)
+
+    def _stop(self, process):
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        with self.start_lock:
+            process, self.process = self.process, None
+            if process is not None:
+                self._stop(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncMcpClient(object):
+    '''
+    asyncio counterpart of McpClient for callers running on an event loop (the Gradio app).
+
+    Same protocol and restart behaviour, but the server runs as an asyncio subprocess and
+    requests are coroutines, so many searches can wait on the server without holding a thread
+    each. A request that times out or is cancelled sends notifications/cancelled so the server
+    can drop the work. The client belongs to the event loop that started the server.
+    '''
+
+    def __init__(self, command=None, env=None, timeout=30, client_name="MapsFindr"):
+        self.command = server_command(command)
+        self.env = env or {}
+        self.timeout = timeout
+        self.client_name = client_name
+        self.process = None
+        self.server_info = None
+        self.restarts = 0
+        self.ids = itertools.count(1)
+        self.pending = {}
+        # pids of server processes whose output has ended
+        self.closed = set()
+        self.stderr_tail = deque(maxlen=50)
+        self.tasks = set()
+        # asyncio locks are bound to the loop they are first used on, and the client may be used
+        # from more than one loop in turn (the warm-up asyncio.run, then Gradio's loop)
+        self.lock_loop = None
+        self._start_lock = None
+        self._write_lock = None
+
+    def _loop_locks(self):
+        loop = asyncio.get_running_loop()
+        if self.lock_loop is not loop:
+            self.lock_loop = loop
+            self._start_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+
+    @property
+    def start_lock(self):
+        self._loop_locks()
+        return self._start_lock
+
+    @property
+    def write_lock(self):
+        self._loop_locks()
+        return self._write_lock
+
+    async def start(self):
+        """
+        Starts the server and runs the MCP initialize handshake, unless it is already running.
+
+        Returns:
+            asyncio.subprocess.Process: The running server process.
+        """
+        async with self.start_lock:
+            process = self.process
+            # returncode is set as soon as the process is reaped, possibly before the read loop sees the end of its output
+            if process is not None and process.returncode is None and process.pid not in self.closed:
+                return process
+            if self.server_info is not None:
+                self.restarts += 1
+            env = os.environ.copy()
+            env.update(self.env)
+            self.stderr_tail.clear()
+            process = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                # Place details can come back as one long JSON line
+                limit=2 ** 24,
+            )
+            self.process = process
+            for coroutine in (self._read_loop(process), self._drain_stderr(process)):
+                task = asyncio.create_task(coroutine)
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+            try:
+                self.server_info = await self._request(process, "initialize", _initialize_params(self.client_name), self.timeout)
+                await self._send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+            except BaseException:
+                await self._stop(process)
+                raise
+            return process
+
+    async def _read_loop(self, process):
+        async for line in process.stdout:
+            message = _parse_message(line.decode("utf-8", "replace"))
+            if message is None:
+                continue
+            if "method" in message:
+                if "id" in message:
+                    try:
+                        await self._send(process, _reply_to_server_request(message))
+                    except McpServerExited:
+                        pass
+                continue
+            entry = self.pending.pop(message.get("id"), None)
+            if entry is None or entry[1].done():
+                continue
+            if "error" in message:
+                entry[1].set_exception(_error_from_reply(message))
+            else:
+                entry[1].set_result(message.get("result"))
+        await process.wait()
+        self.closed.add(process.pid)
+        error = _exit_error(process.returncode, self.stderr_tail)
+        for request_id, (owner, future) in list(self.pending.items()):
+            if owner is process:
+                del self.pending[request_id]
+                if not future.done():
+                    future.set_exception(error)
+        if self.process is process:
+            self.process = None
+
+    async def _drain_stderr(self, process):
+        async for line in process.stderr:
+            self.stderr_tail.append(line.decode("utf-8", "replace"))
+
+    async def _send(self, process, message):
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            async with self.write_lock:
+                process.stdin.write(line)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError, OSError, RuntimeError) as e:
+            raise McpServerExited(f"MCP server is not accepting requests: {e!r}")
+
+    async def _request(self, process, method, params, timeout):
+        if process.pid in self.closed:
+            raise McpServerExited(f"MCP server exited with code {process.returncode}")
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (process, future)
+        try:
+            await self._send(process, {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            await self._cancel(process, request_id, "timeout" if isinstance(e, asyncio.TimeoutError) else "cancelled")
+            if isinstance(e, asyncio.TimeoutError):
+                raise asyncio.TimeoutError(f"MCP request {method} timed out after {timeout}s")
+            raise
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def _cancel(self, process, request_id, reason):
+        try:
+            await self._send(process, {"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                       "params": {"requestId": request_id, "reason": reason}})
+        except McpServerExited:
+            pass
+
+    async def request(self, method, params=None, timeout=None):
+        """
+        Sends a JSON-RPC request and waits for its reply. Any number of requests can be in flight.
+
+        Args:
+            method (str): The JSON-RPC method, e.g. "tools/call".
+            params (dict): The request parameters.
+            timeout (float): Seconds to wait for the reply. Defaults to the client timeout.
+
+        Returns:
+            The result member of the reply.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await self._request(await self.start(), method, params, timeout)
+        except McpServerExited:
+            # The server crashed under this request: start a new one and try once more
+            return await self._request(await self.start(), method, params, timeout)
+
+    async def list_tools(self):
+        return (await self.request("tools/list")).get("tools", [])
+
+    async def call_tool(self, name, arguments, timeout=None):
+        """
+        Calls an MCP tool and returns its text output.
+
+        Args:
+            name (str): The tool name, e.g. "maps_search_places".
+            arguments (dict): The tool arguments.
+            timeout (float): Seconds to wait for the reply. Defaults to the client timeout.
+
+        Returns:
+            str: The text content items of the result, joined by line breaks.
+        """
+        result = await self.request("tools/call", {"name": name, "arguments": arguments}, timeout)
+        return _tool_text(name, result)
+
+    async def _stop(self, process):
+        try:
+            process.stdin.close()
+        except (OSError, RuntimeError):
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def close(self):
+        async with self.start_lock:
+            process, self.process = self.process, None
+            if process is not None:
+                await self._stop(process)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
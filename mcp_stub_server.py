@@ -0,0 +1,95 @@
+"""
+Minimal offline stand-in for the Google Maps MCP server, speaking JSON-RPC over stdio.
+
+Run MapsFindr against it without network access or an API key:
+
+    MAPS_MCP_COMMAND="python mcp_stub_server.py" python MapsFindr.py
+
+maps_search_places answers with a canned place built from the query. Queries containing
+"#crash" make the server exit (to exercise restarts) and "#sleep=N" delays the reply by N
+seconds, answering other requests meanwhile (to exercise concurrent requests).
+"""
+import json
+import re
+import sys
+import threading
+import time
+
+TOOLS = [
+    {
+        "name": "maps_search_places",
+        "description": "Search for places using Google Places API",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"],
+        },
+    },
+]
+
+write_lock = threading.Lock()
+
+
+def send(message):
+    with write_lock:
+        sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def search_places(query):
+    return {
+        "places": [{
+            "name": query,
+            "formatted_address": f"1 Place de la Mairie, {query}",
+            "location": {"lat": 43.31, "lng": 3.47},
+            "place_id": f"stub-{abs(hash(query)) % 10 ** 8}",
+            "rating": 4.5,
+            "types": ["point_of_interest"],
+        }]
+    }
+
+
+def call_tool(request_id, params):
+    name = params.get("name")
+    arguments = params.get("arguments") or {}
+    if name != "maps_search_places":
+        send({"jsonrpc": "2.0", "id": request_id, "result": {
+            "content": [{"type": "text", "text": f"Unknown tool: {name}"}], "isError": True}})
+        return
+    query = arguments.get("query", "")
+    delay = re.search(r"#sleep=([\d.]+)", query)
+    if delay:
+        time.sleep(float(delay.group(1)))
+    send({"jsonrpc": "2.0", "id": request_id, "result": {
+        "content": [{"type": "text", "text": json.dumps(search_places(query), ensure_ascii=False, indent=2)}],
+        "isError": False}})
+
+
+def main():
+    for line in sys.stdin:
+        message = json.loads(line)
+        method = message.get("method")
+        request_id = message.get("id")
+        if request_id is None:
+            continue  # notifications
+        if method == "initialize":
+            send({"jsonrpc": "2.0", "id": request_id, "result": {
+                "protocolVersion": message["params"].get("protocolVersion"),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "maps-stub", "version": "0.1.0"}}})
+        elif method == "tools/list":
+            send({"jsonrpc": "2.0", "id": request_id, "result": {"tools": TOOLS}})
+        elif method == "tools/call":
+            if "#crash" in json.dumps(message["params"]):
+                sys.stderr.write("stub: crashing on request\n")
+                sys.exit(1)
+            threading.Thread(target=call_tool, args=(request_id, message["params"]), daemon=True).start()
+        elif method == "ping":
+            send({"jsonrpc": "2.0", "id": request_id, "result": {}})
+        else:
+            send({"jsonrpc": "2.0", "id": request_id,
+                  "error": {"code": -32601, "message": f"Method not found: {method}"}})
+
+
+if __name__ == "__main__":
+    main()
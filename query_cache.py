@@ -0,0 +1,144 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_whitespace_pattern = re.compile(r"\s+")
+_edge_punctuation = " \t\n.,;:!?\"'«»"
+
+
+def normalize_query(text):
+    """
+    Normalizes a search so that trivially different spellings of the same lookup share a cache entry.
+
+    Args:
+        text (str): The raw query, e.g. "  Marché  d'Agde ?".
+
+    Returns:
+        str: The query case-folded, without accents, with whitespace collapsed and the
+        surrounding punctuation stripped, e.g. "marche d'agde".
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return _whitespace_pattern.sub(" ", text).strip(_edge_punctuation)
+
+
+class TtlCache(object):
+    '''
+    Size-bounded LRU cache whose entries expire ttl seconds after they were stored.
+
+    Keys are normalized with normalize_query. With store_path set, entries are also written to a
+    SQLite file so they survive restarts; several caches can share one file under different
+    namespaces. Values must be strings to be persisted.
+    '''
+
+    def __init__(self, namespace, ttl, max_entries=1000, store_path=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        if store_path:
+            # Used from Gradio worker threads as well as the event loop thread
+            self.connection = sqlite3.connect(store_path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self.connection.commit()
+
+    def _load(self, key):
+        if self.connection is None:
+            return None
+        return self.connection.execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+
+    def get(self, query):
+        """
+        Looks a query up.
+
+        Args:
+            query (str): The raw query.
+
+        Returns:
+            The cached value, or None on a miss or when the entry has expired.
+        """
+        key = normalize_query(query)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is not None and entry[1] <= now:
+                self.expired += 1
+                self.memory.pop(key, None)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+            return entry[0]
+
+    def put(self, query, value):
+        key = normalize_query(query)
+        entry = (value, time.time() + self.ttl)
+        with self.lock:
+            self._remember(key, entry)
+            if self.connection is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, value, entry[1]),
+                )
+                self.connection.commit()
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self):
+        """
+        Drops every expired entry from memory and from the store.
+
+        Returns:
+            int: Number of entries dropped from memory.
+        """
+        now = time.time()
+        with self.lock:
+            stale = [key for key, (_, expires_at) in self.memory.items() if expires_at <= now]
+            for key in stale:
+                del self.memory[key]
+            if self.connection is not None:
+                self.connection.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+                self.connection.commit()
+        return len(stale)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "in_memory": len(self.memory),
+        }
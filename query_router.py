@@ -0,0 +1,78 @@
+import json
+import re
+
+from query_cache import normalize_query
+
+DIRECT = "direct"
+AGENT = "agent"
+
+# Words (normalized: lowercase, no accents) that make a query a question for the agent rather
+# than a plain place lookup
+question_words = {
+    "comment", "quel", "quelle", "quels", "quelles", "ou", "quand", "pourquoi", "combien", "qui", "est-ce",
+    "evenement", "evenements", "aujourd'hui", "demain", "soir", "week-end", "weekend", "horaires", "ouvert",
+    "ouverte", "prix", "tarif", "tarifs", "itineraire", "trajet", "distance", "proche", "pres", "autour",
+    "meilleur", "meilleurs", "meilleure", "recommande", "conseille", "compare",
+    "what", "where", "when", "how", "which", "who", "why", "events", "event", "today", "tomorrow", "tonight",
+    "open", "near", "nearby", "best", "route", "directions",
+}
+_word_pattern = re.compile(r"[\w'-]+")
+
+
+def route_query(query, max_words=8):
+    """
+    Decides whether a query is a plain place lookup that can go straight to the Maps tool.
+
+    Args:
+        query (str): The user query.
+        max_words (int): Longer queries are treated as free-form questions.
+
+    Returns:
+        str: DIRECT for place lookups such as "marché Agde", AGENT for questions such as
+        "quels événements ce week-end à Sète ?".
+    """
+    if "?" in query:
+        return AGENT
+    words = _word_pattern.findall(normalize_query(query))
+    if not words or len(words) > max_words:
+        return AGENT
+    if any(word in question_words for word in words):
+        return AGENT
+    return DIRECT
+
+
+def format_places(text, limit=5):
+    """
+    Renders a maps_search_places result as Markdown without going through the LLM.
+
+    Args:
+        text (str): The tool output, a JSON object with a "places" list.
+        limit (int): Maximum number of places shown.
+
+    Returns:
+        str: The Markdown, the raw text when it isn't JSON, or None when no place was found.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, json.JSONDecodeError):
+        return text.strip() or None
+    places = data.get("places", data.get("results")) if isinstance(data, dict) else data
+    if not places or not isinstance(places, list):
+        return None
+    blocks = []
+    for place in places[:limit]:
+        lines = [f"### {place.get('name', 'Unnamed place')}"]
+        if place.get("formatted_address"):
+            lines.append(f"- **Address:** {place['formatted_address']}")
+        if place.get("rating") is not None:
+            reviews = place.get("user_ratings_total")
+            lines.append(f"- **Rating:** {place['rating']}" + (f" ({reviews} reviews)" if reviews else ""))
+        open_now = (place.get("opening_hours") or {}).get("open_now")
+        if open_now is not None:
+            lines.append("- **Open now**" if open_now else "- **Closed now**")
+        if place.get("types"):
+            lines.append("- **Type:** " + ", ".join(kind.replace("_", " ") for kind in place["types"][:3]))
+        if place.get("place_id"):
+            lines.append(f"- [Open in Google Maps](https://www.google.com/maps/place/?q=place_id:{place['place_id']})")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)